@@ -0,0 +1,57 @@
+import asyncio
+
+from backend.campaigns import active_campaign_ids
+from backend.logs import get_logger, stage
+from backend.wb_api import AD_STAT_FIELDS, ad_metrics, fetch_ad_stats
+from backend.wb_client import WBClient
+
+AD_STATS_KEY = ("date", "advertId", "appType", "nmId")
+
+log = get_logger("ad_stats")
+
+
+# === Хранилище рекламной статистики ===
+# ad_stats хранит статистику на уровне (дата, кампания, платформа, артикул);
+# ad_* колонки sales считаются из неё суммой по кампаниям и платформам.
+async def sync_ad_stats(store, dates: list, campaign_ids: list | None = None,
+                        client: WBClient | None = None) -> int:
+    """Докачивает fullstats за даты и upsert-ит строки в ad_stats.
+
+    Без campaign_ids запрашиваются только кампании, активные в эти даты (реестр campaigns).
+    Упавший чанк кампаний не трогает уже сохранённые строки этих кампаний.
+    """
+    with stage(log, "ad_stats", period=f"{min(dates)}..{max(dates)}" if dates else "-") as counters:
+        if campaign_ids is None:
+            campaign_ids = await active_campaign_ids(store, dates, client)
+        failed = []
+        rows = await fetch_ad_stats(dates, campaign_ids, failed=failed, client=client)
+        written = await asyncio.to_thread(store.bulk_upsert, "ad_stats", rows, AD_STATS_KEY)
+        counters.add(campaigns=len(campaign_ids), written=written, failed=len(failed))
+        if failed:
+            log.warning(f"⚠️ Не загружено чанков fullstats: {len(failed)} — для них остаются прежние данные")
+    return written
+
+
+def load_ad_metrics_by_day(store, dates: list) -> dict:
+    """{дата: {nmID: ad_*}} из ad_stats за указанные даты."""
+    if not dates:
+        return {}
+    sums = ", ".join(f"SUM({column})" for column in AD_STAT_FIELDS.values())
+    rows = store.query(
+        f"SELECT date, nmId, {sums} FROM ad_stats"
+        f" WHERE date IN ({', '.join('?' * len(dates))}) GROUP BY date, nmId",
+        tuple(dates),
+    )
+    by_day = {}
+    for row in rows:
+        by_day.setdefault(str(row[0])[:10], {})[row[1]] = ad_metrics(*(value or 0 for value in row[2:]))
+    return by_day
+
+
+async def get_stored_ad_metrics(store, dates: list, client: WBClient | None = None) -> dict:
+    try:
+        await sync_ad_stats(store, dates, client=client)
+    except Exception as err:
+        # Список кампаний не получен — считаем по тому, что уже есть в ad_stats
+        log.error(f"❌ Не удалось обновить рекламную статистику: {err}")
+    return await asyncio.to_thread(load_ad_metrics_by_day, store, dates)
@@ -0,0 +1,107 @@
+import gzip
+import io
+import json
+import os
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from backend.logs import get_logger
+
+# === Архив сырых ответов WB ===
+# Каждый успешный ответ дописывается строкой JSON с метаданными запроса в
+# {WB_ARCHIVE_DIR}/{дата}/{хост}.jsonl.zst. Запись — отдельный zstd-фрейм,
+# поэтому оборванный прогон портит максимум последнюю строку, а не весь файл.
+WB_ARCHIVE = os.getenv("WB_ARCHIVE", "1") == "1"
+WB_ARCHIVE_DIR = os.getenv(
+    "WB_ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive")
+)
+WB_ARCHIVE_LEVEL = int(os.getenv("WB_ARCHIVE_LEVEL", "6"))
+
+# Без пакета zstandard архив пишется в gzip (.jsonl.gz), читаются оба формата
+ARCHIVE_SUFFIX = ".jsonl.zst" if zstandard else ".jsonl.gz"
+# Ошибки чтения оборванного файла
+TRUNCATED_ERRORS = (EOFError, ValueError) + ((zstandard.ZstdError,) if zstandard else ())
+
+log = get_logger("archive")
+
+
+def _open_lines(path: str):
+    if path.endswith(".zst"):
+        raw = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(raw, encoding="utf-8")
+    return gzip.open(path, "rt", encoding="utf-8")
+
+
+class ResponseArchive:
+    """Append-only архив ответов: один файл на хост и день загрузки."""
+
+    def __init__(self, root: str = WB_ARCHIVE_DIR):
+        self.root = root
+        self._files = {}
+        self._zstd = zstandard.ZstdCompressor(level=WB_ARCHIVE_LEVEL) if zstandard else None
+
+    def _compress(self, data: bytes) -> bytes:
+        if self._zstd is not None:
+            return self._zstd.compress(data)
+        return gzip.compress(data, compresslevel=WB_ARCHIVE_LEVEL)
+
+    def _file(self, day: str, host: str):
+        key = (day, host)
+        f = self._files.get(key)
+        if f is None:
+            os.makedirs(os.path.join(self.root, day), exist_ok=True)
+            f = self._files[key] = open(os.path.join(self.root, day, host + ARCHIVE_SUFFIX), "ab")
+        return f
+
+    def append(self, host: str, method: str, path: str, params, body, response):
+        now = datetime.utcnow()
+        record = {
+            "ts": now.isoformat(timespec="seconds"),
+            "host": host,
+            "method": method,
+            "path": path,
+            "params": dict(params) if params else None,
+            "body": body,
+            "status": response.status_code,
+            "response": response.json(),
+        }
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        f = self._file(now.date().isoformat(), host)
+        f.write(self._compress(line.encode("utf-8")))
+        f.flush()
+
+    def close(self):
+        files, self._files = self._files, {}
+        for f in files.values():
+            f.close()
+
+
+def iter_records(root: str = WB_ARCHIVE_DIR, path: str | None = None,
+                 since: str | None = None, until: str | None = None):
+    """Записи архива по дням загрузки (since/until — границы дней), в порядке записи.
+
+    path — отбор по пути эндпоинта, например "/adv/v2/fullstats".
+    """
+    if not os.path.isdir(root):
+        return
+    for day in sorted(os.listdir(root)):
+        if (since and day < since) or (until and day > until):
+            continue
+        day_dir = os.path.join(root, day)
+        for name in sorted(os.listdir(day_dir)):
+            if not name.endswith((".jsonl.zst", ".jsonl.gz")):
+                continue
+            file_path = os.path.join(day_dir, name)
+            try:
+                with _open_lines(file_path) as lines:
+                    for line in lines:
+                        record = json.loads(line)
+                        if path is None or record["path"] == path:
+                            yield record
+            except TRUNCATED_ERRORS as err:
+                # Оборванная последняя запись: всё, что до неё, уже отдано
+                log.warning(f"⚠️ {file_path}: архив обрывается ({err}), остаток пропущен")
@@ -0,0 +1,61 @@
+from datetime import date, datetime, timedelta
+
+
+# === Чекпоинты бэкфилла ===
+# Единица работы — (источник, период, батч nmID). Отмечается после коммита данных,
+# поэтому повторный запуск продолжает с первой незакоммиченной единицы.
+def init_checkpoints(store):
+    store.migrate()
+
+
+def batch_key(nm_ids: list) -> str:
+    return ",".join(str(nm_id) for nm_id in sorted(nm_ids))
+
+
+def load_done(store, source: str, begin: str, end: str) -> set:
+    rows = store.query(
+        "SELECT batch_key FROM backfill_checkpoints"
+        " WHERE source = ? AND period_begin = ? AND period_end = ?",
+        (source, begin, end),
+    )
+    return {row[0] for row in rows}
+
+
+def mark_done(store, source: str, begin: str, end: str, nm_ids: list, rows: int = 0):
+    store.bulk_upsert("backfill_checkpoints", [{
+        "source": source,
+        "period_begin": begin,
+        "period_end": end,
+        "batch_key": batch_key(nm_ids),
+        "row_count": rows,
+        "committed_at": datetime.utcnow().isoformat(timespec="seconds"),
+    }], ("source", "period_begin", "period_end", "batch_key"))
+
+
+# === Поиск пропусков в sales ===
+def find_sales_gaps(store, nm_ids: list, begin: date, end: date) -> dict:
+    """Возвращает {nm_ID: [даты]} для пар (nm_ID, date), которых нет в sales за период."""
+    rows = store.query(
+        "SELECT nm_ID, date FROM sales WHERE date BETWEEN ? AND ?",
+        (begin.isoformat(), end.isoformat()),
+    )
+    # В Postgres date — DATE, в SQLite — строка
+    present = {(row[0], str(row[1])[:10]) for row in rows}
+
+    days = [(begin + timedelta(days=i)).isoformat() for i in range((end - begin).days + 1)]
+    gaps = {}
+    for nm_id in nm_ids:
+        missing = [day for day in days if (nm_id, day) not in present]
+        if missing:
+            gaps[nm_id] = missing
+    return gaps
+
+
+def plan_batches(store, source: str, nm_ids: list, begin: date, end: date,
+                 batch_size: int, resume: bool = True) -> list:
+    """Батчи nmID, которые ещё нужно запросить за период: только с пропусками и без чекпоинта."""
+    begin_str, end_str = begin.isoformat(), end.isoformat()
+    pending = sorted(find_sales_gaps(store, nm_ids, begin, end)) if resume else sorted(nm_ids)
+    done = load_done(store, source, begin_str, end_str) if resume else set()
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    return [batch for batch in batches if batch_key(batch) not in done]
@@ -0,0 +1,308 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from backend.ad_stats import AD_STATS_KEY, load_ad_metrics_by_day
+from backend.card_store import upsert_cards
+from backend.mock_wb import SUBJECTS, SyntheticCatalog
+from backend.storage import enrich_sales_rows, load_card_details, normalize_sales, open_store, upsert_sales
+from backend.test_cycle import date_windows
+from backend.wb_api import SALES_BATCH_SIZE, campaigns_active_during, parse_fullstats
+from backend.work_with_cards import recompute_card_profits
+
+# === Бенчмарк загрузки и API ===
+# Генератор заполняет cards, ad_stats и sales синтетикой N карточек × M дней через тот же
+# путь записи, что и конвейер (fullstats -> ad_stats, normalize -> enrich с рекламой ->
+# upsert_sales с пересчётом агрегатов),
+# затем меряет задержку трёх эндпоинтов main.py на нескольких ширинах периода.
+# Результат — JSON, который сравнивается с прошлым прогоном через --compare.
+# --scale прогоняет несколько размеров каталога и проверяет, что время растёт линейно.
+BENCH_START = date(2025, 1, 1)
+BENCH_WINDOW_DAYS = 7
+RANGE_WIDTHS = (7, 30, 90)
+
+# Таблицы, которые заполняет прогон: --scale очищает их перед следующим размером
+BENCH_TABLES = ("cards", "sales", "ad_stats", "sales_daily_imt", "sales_daily_vendor", "sync_state")
+
+# Себестоимость единицы синтетического товара
+BENCH_CARD_COSTS = {
+    "purchase_price": 400, "delivery_to_warehouse": 50, "wb_logistics": 80,
+    "packaging": 10, "fuel": 5, "gift": 0, "defect_percent": 2,
+}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss в Linux — килобайты
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def percentiles(samples: list) -> dict:
+    values = np.array(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p95_ms": round(float(np.percentile(values, 95)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+        "max_ms": round(float(values.max()), 2),
+    }
+
+
+# === Генератор данных ===
+def generate_cards(store, catalog: SyntheticCatalog) -> int:
+    upsert_cards(store, catalog.cards)
+    store.bulk_upsert("cards", [
+        {
+            "nmID": card["nmID"],
+            "price": catalog.prices[card["nmID"]][0],
+            "commission_percent": SUBJECTS[card["subjectName"]],
+            **BENCH_CARD_COSTS,
+        }
+        for card in catalog.cards
+    ], ("nmID",))
+    discounted = {nm_id: round(price * (100 - discount) / 100) for nm_id, (price, discount) in catalog.prices.items()}
+    updated, _ = recompute_card_profits(store, discounted)
+    return updated
+
+
+def ingest_sales(store, catalog: SyntheticCatalog, days: int) -> dict:
+    """Загрузка M дней рекламы и продаж батчами; время считается только по стадиям записи."""
+    cards_info = {card["nmID"]: {"imtID": card["imtID"]} for card in catalog.cards}
+    cards_by_nm = {card["nmID"]: card for card in catalog.cards}
+    card_details = load_card_details(store)
+    nm_ids = [card["nmID"] for card in catalog.cards]
+    batches = [nm_ids[i:i + SALES_BATCH_SIZE] for i in range(0, len(nm_ids), SALES_BATCH_SIZE)]
+    timings = {"ad_stats": 0.0, "normalize": 0.0, "enrich": 0.0, "write": 0.0}
+    rows_total = 0
+    calls = 0
+
+    last_day = BENCH_START + timedelta(days=days - 1)
+    for begin, end in date_windows(BENCH_START, last_day, BENCH_WINDOW_DAYS):
+        window = [(begin + timedelta(days=i)).isoformat() for i in range((end - begin).days + 1)]
+        # fullstats активных кампаний за период, как их отдаёт WB
+        active = set(campaigns_active_during(catalog.campaigns, window))
+        fullstats = [
+            {"advertId": campaign["advertId"], "days": [catalog.fullstats(campaign, day) for day in window]}
+            for campaign in catalog.campaigns if campaign["advertId"] in active
+        ]
+        started = time.perf_counter()
+        store.bulk_upsert("ad_stats", parse_fullstats(fullstats), AD_STATS_KEY)
+        ad_by_day = load_ad_metrics_by_day(store, window)
+        timings["ad_stats"] += time.perf_counter() - started
+
+        for batch in batches:
+            # Ответ nm-report в том виде, в каком его отдаёт WB (генерация не входит в замер)
+            data = [
+                {"nmID": nm_id, "imtName": cards_by_nm[nm_id]["title"],
+                 "vendorCode": cards_by_nm[nm_id]["vendorCode"],
+                 "history": [catalog.history(nm_id, day) for day in window]}
+                for nm_id in batch
+            ]
+            started = time.perf_counter()
+            rows = normalize_sales(data, cards_info)
+            normalized = time.perf_counter()
+            rows = enrich_sales_rows(rows, ad_by_day, card_details)
+            enriched = time.perf_counter()
+            upsert_sales(store, rows)
+            written = time.perf_counter()
+            timings["normalize"] += normalized - started
+            timings["enrich"] += enriched - normalized
+            timings["write"] += written - enriched
+            rows_total += len(rows)
+            calls += 1
+
+    elapsed = sum(timings.values())
+    return {
+        "rows": rows_total,
+        "batches": calls,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows_total / elapsed, 1) if elapsed else None,
+        "stage_seconds": {stage: round(value, 3) for stage, value in timings.items()},
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+# === Эндпоинты ===
+def bench_endpoints(store, days: int, repeats: int) -> dict:
+    """Задержка эндпоинтов main.py; SQL у них под Postgres, на SQLite замер пропускается."""
+    if store.dialect != "postgres":
+        return {"skipped": "эндпоинты main.py работают только с Postgres (--db-url postgresql://...)"}
+    from backend.main import get_sales_by_imt, get_sales_by_imt_daily, get_sales_grouped_detailed_range
+
+    imt_id = store.query("SELECT MIN(imtID) FROM cards")[0][0]
+    endpoints = {
+        "sales_grouped_detailed_range": lambda start, end: get_sales_grouped_detailed_range(start, end, conn=store.conn),
+        "sales_by_imt": lambda start, end: get_sales_by_imt(imt_id, start, end, conn=store.conn),
+        "sales_by_imt_daily": lambda start, end: get_sales_by_imt_daily(imt_id, start, end, conn=store.conn),
+    }
+    results = {}
+    for width in (width for width in RANGE_WIDTHS if width <= days):
+        start = BENCH_START.isoformat()
+        end = (BENCH_START + timedelta(days=width - 1)).isoformat()
+        for name, call in endpoints.items():
+            call(start, end)  # прогрев кэша планов и страниц
+            samples = []
+            for _ in range(repeats):
+                started = time.perf_counter()
+                call(start, end)
+                samples.append(time.perf_counter() - started)
+            results.setdefault(name, {})[f"{width}d"] = percentiles(samples)
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+# === Сравнение с прошлым прогоном ===
+def compare(current: dict, baseline: dict, max_regression: float) -> bool:
+    """Пропускная способность не должна падать, а p95 — расти больше чем на max_regression."""
+    ok = True
+    checks = [("ingest.rows_per_sec", current["ingest"]["rows_per_sec"], baseline["ingest"]["rows_per_sec"], True)]
+    for name, widths in current.get("endpoints", {}).items():
+        if not isinstance(widths, dict):
+            continue
+        for width, stats in widths.items():
+            old = baseline.get("endpoints", {}).get(name, {}).get(width)
+            if old:
+                checks.append((f"{name}.{width}.p95_ms", stats["p95_ms"], old["p95_ms"], False))
+    for metric, new, old, higher_is_better in checks:
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        regression = -change if higher_is_better else change
+        status = "❌" if regression > max_regression else "✅"
+        ok = ok and regression <= max_regression
+        print(f"{status} {metric}: {old} → {new} ({change:+.1%})")
+    return ok
+
+
+# === Масштабируемость по каталогу ===
+def scaling_metrics(result: dict) -> dict:
+    """Времена, которые должны расти не быстрее каталога: загрузка и самый широкий период эндпоинта."""
+    metrics = {"ingest.seconds": result["ingest"]["seconds"]}
+    widths = result["endpoints"].get("sales_grouped_detailed_range")
+    if widths:
+        widest = max(widths, key=lambda width: int(width.rstrip("d")))
+        metrics[f"sales_grouped_detailed_range.{widest}.p50_ms"] = widths[widest]["p50_ms"]
+    return metrics
+
+
+def check_scaling(results: list, max_ratio: float) -> bool:
+    """Отношение роста времени к росту каталога: ~1 — линейно, ~2 на удвоении — квадратично."""
+    ok = True
+    for previous, current in zip(results, results[1:]):
+        size_ratio = current["params"]["cards"] / previous["params"]["cards"]
+        old_metrics = scaling_metrics(previous)
+        for metric, new in scaling_metrics(current).items():
+            old = old_metrics.get(metric)
+            if not old:
+                continue
+            growth = (new / old) / size_ratio
+            status = "❌" if growth > max_ratio else "✅"
+            ok = ok and growth <= max_ratio
+            print(f"{status} {metric} {previous['params']['cards']} → {current['params']['cards']}:"
+                  f" рост времени / рост каталога = {growth:.2f}")
+    return ok
+
+
+def clear_bench_tables(db_url: str):
+    store = open_store(db_url)
+    for table in BENCH_TABLES:
+        store.execute(f"DELETE FROM {table}")
+    store.commit()
+    store.close()
+
+
+def scale(sizes: list, days: int, repeats: int, db_url: str | None, seed: int) -> list:
+    """Прогон main() на каждом размере каталога; база с --db-url очищается между размерами."""
+    results = []
+    for cards in sizes:
+        results.append(main(cards, days, repeats, db_url, seed))
+        if db_url is not None:
+            clear_bench_tables(db_url)
+    return results
+
+
+def main(cards: int, days: int, repeats: int, db_url: str | None, seed: int) -> dict:
+    # Без --db-url — одноразовая SQLite-база: DB_URL из окружения здесь не читается,
+    # чтобы генератор не залил синтетику в рабочую базу
+    tmp_dir = None
+    if db_url is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        db_url = f"sqlite:///{os.path.join(tmp_dir.name, 'bench.db')}"
+    store = open_store(db_url)
+    if store.query("SELECT COUNT(*) FROM cards")[0][0]:
+        store.close()
+        raise SystemExit("❌ В базе уже есть карточки — для бенчмарка нужна пустая база")
+
+    catalog = SyntheticCatalog(cards, seed)
+    started = time.perf_counter()
+    generate_cards(store, catalog)
+    print(f"🗂 Карточек: {cards} ({time.perf_counter() - started:.2f} с)")
+    ingest = ingest_sales(store, catalog, days)
+    print(f"💾 Загрузка: {ingest['rows']} строк, {ingest['rows_per_sec']} строк/с, пик RSS {ingest['peak_rss_mb']} МБ")
+    endpoints = bench_endpoints(store, days, repeats)
+    for name, widths in endpoints.items():
+        if isinstance(widths, dict):
+            for width, stats in widths.items():
+                print(f"⏱ {name} [{width}]: p50 {stats['p50_ms']} мс, p95 {stats['p95_ms']} мс")
+        elif name == "skipped":
+            print(f"⏭ {widths}")
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "params": {"cards": cards, "days": days, "repeats": repeats, "seed": seed, "dialect": store.dialect},
+        "ingest": ingest,
+        "endpoints": endpoints,
+    }
+    store.close()
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк загрузки продаж и эндпоинтов API")
+    parser.add_argument("--cards", type=int, default=1000, help="число карточек")
+    parser.add_argument("--days", type=int, default=30, help="число дней истории")
+    parser.add_argument("--repeats", type=int, default=20, help="замеров на эндпоинт и ширину периода")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db-url", help="пустая база для прогона (по умолчанию — временная SQLite)")
+    parser.add_argument("--output", default="bench_results.json", help="куда записать JSON с результатами")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="допустимое ухудшение метрики относительно --compare (0.2 = 20%%)")
+    parser.add_argument("--scale", help="размеры каталога через запятую (например 1000,2000,4000) вместо --cards")
+    parser.add_argument("--max-ratio", type=float, default=1.5,
+                        help="допустимый рост времени относительно роста каталога для --scale")
+    args = parser.parse_args()
+
+    if args.scale:
+        result = scale([int(size) for size in args.scale.split(",")], args.days, args.repeats, args.db_url, args.seed)
+    else:
+        result = main(args.cards, args.days, args.repeats, args.db_url, args.seed)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"📄 Результаты: {args.output}")
+    if args.scale and not check_scaling(result, args.max_ratio):
+        raise SystemExit(1)
+    if args.compare and not args.scale:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("params") != result["params"]:
+            print("⚠️ Параметры прогонов различаются — сравнение приблизительное")
+        if not compare(result, baseline, args.max_regression):
+            raise SystemExit(1)
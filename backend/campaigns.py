@@ -0,0 +1,65 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+from backend.card_store import get_sync_cursor, set_sync_cursor
+from backend.logs import get_logger
+from backend.wb_api import campaigns_active_during, fetch_campaigns
+from backend.wb_client import WBClient
+
+# Сколько секунд реестр кампаний считается свежим
+WB_CAMPAIGNS_TTL = int(os.getenv("WB_CAMPAIGNS_TTL", "3600"))
+CAMPAIGNS_SYNC_NAME = "campaigns"
+
+log = get_logger("campaigns")
+
+
+# === Реестр рекламных кампаний ===
+# promotion/count кэшируется в таблице campaigns (статус и changeTime каждой кампании),
+# время обновления — в sync_state. Реестр, обновлённый после окончания периода,
+# точен для этого периода: всё, что случилось с кампаниями позже, на него не влияет.
+def registry_is_fresh(refreshed_at: str | None, dates: list, ttl: int = WB_CAMPAIGNS_TTL) -> bool:
+    if not refreshed_at:
+        return False
+    now = datetime.utcnow()
+    refreshed = datetime.fromisoformat(refreshed_at)
+    if now - refreshed > timedelta(seconds=ttl):
+        return False
+    # Кампании, созданные после обновления, могли крутиться в ещё не закончившиеся даты
+    return refreshed_at[:10] > max(str(day)[:10] for day in dates)
+
+
+def load_campaigns(store) -> list:
+    rows = store.query("SELECT advertId, type, status, changeTime FROM campaigns")
+    return [dict(zip(("advertId", "type", "status", "changeTime"), row)) for row in rows]
+
+
+def save_campaigns(store, campaigns: list):
+    """Заменяет реестр свежим списком: удалённые в WB кампании из него уходят."""
+    store.bulk_upsert("campaigns", campaigns, ("advertId",))
+    fresh = {campaign["advertId"] for campaign in campaigns}
+    gone = [(row[0],) for row in store.query("SELECT advertId FROM campaigns") if row[0] not in fresh]
+    if gone:
+        store.executemany("DELETE FROM campaigns WHERE advertId = ?", gone)
+        store.commit()
+    set_sync_cursor(store, CAMPAIGNS_SYNC_NAME, datetime.utcnow().isoformat(timespec="seconds"))
+
+
+async def get_campaigns(store, dates: list, client: WBClient | None = None,
+                        ttl: int = WB_CAMPAIGNS_TTL) -> list:
+    """Кампании из реестра; promotion/count запрашивается, только если реестр устарел."""
+    refreshed_at = await asyncio.to_thread(get_sync_cursor, store, CAMPAIGNS_SYNC_NAME)
+    if registry_is_fresh(refreshed_at, dates, ttl):
+        return await asyncio.to_thread(load_campaigns, store)
+    campaigns = await fetch_campaigns(client)
+    await asyncio.to_thread(save_campaigns, store, campaigns)
+    log.info(f"📋 Реестр кампаний обновлён: {len(campaigns)}")
+    return campaigns
+
+
+async def active_campaign_ids(store, dates: list, client: WBClient | None = None) -> list:
+    """advertId кампаний, у которых может быть статистика за даты."""
+    campaigns = await get_campaigns(store, dates, client)
+    active = campaigns_active_during(campaigns, dates)
+    log.info(f"📣 Кампаний для fullstats: {len(active)} из {len(campaigns)}")
+    return active
@@ -0,0 +1,63 @@
+from backend.logs import get_logger
+from backend.wb_api import fetch_cards_raw
+from backend.wb_client import WBClient
+
+log = get_logger("card_store")
+
+
+# === Локальное хранилище карточек ===
+# Все функции принимают хранилище из backend.storage.open_store (SQLite или Postgres)
+def init_store(store):
+    store.migrate()
+
+
+def get_sync_cursor(store, name: str) -> str | None:
+    rows = store.query("SELECT cursor FROM sync_state WHERE name = ?", (name,))
+    return rows[0][0] if rows else None
+
+
+def set_sync_cursor(store, name: str, cursor: str | None):
+    store.bulk_upsert("sync_state", [{"name": name, "cursor": cursor}], ("name",))
+
+
+def upsert_cards(store, cards: list):
+    # Обновляем только поля из Content API: цены и себестоимость в cards не трогаем
+    store.bulk_upsert("cards", [
+        {
+            "nmID": card["nmID"],
+            "imtID": card.get("imtID"),
+            "vendorCode": card.get("vendorCode"),
+            "brand": card.get("brand"),
+            "subjectName": card.get("subjectName"),
+            "updatedAt": card.get("updatedAt"),
+        }
+        for card in cards if card.get("nmID")
+    ], ("nmID",))
+
+
+def load_cards_info(store) -> dict:
+    return {
+        row[0]: {"imtID": row[1], "vendorCode": row[2], "brand": row[3], "subjectName": row[4]}
+        for row in store.query("SELECT nmID, imtID, vendorCode, brand, subjectName FROM cards")
+    }
+
+
+# === Синхронизация каталога ===
+async def sync_cards(store, full: bool = False, client: WBClient | None = None) -> dict:
+    """Обновляет локальный каталог и возвращает cards_info {nmID: {...}}.
+
+    По умолчанию запрашиваются только карточки, изменённые после сохранённого
+    курсора updatedAt; full=True (или пустой курсор) — полный обход каталога.
+    """
+    init_store(store)
+    since = None if full else get_sync_cursor(store, "cards")
+    cards = await fetch_cards_raw(client, since=since)
+    upsert_cards(store, cards)
+
+    latest = max((card.get("updatedAt") or "" for card in cards), default="")
+    if latest and (since is None or latest > since):
+        set_sync_cursor(store, "cards", latest)
+
+    mode = "полная" if since is None else f"изменения с {since}"
+    log.info(f"✅ Синхронизация карточек ({mode}): обновлено {len(cards)}")
+    return load_cards_info(store)
@@ -1,74 +1,34 @@
-import os
-import httpx
-from dotenv import load_dotenv
-from hlam.db import init_db, save_cards_to_db
-import asyncio
+import argparse
+
+from hlam.db import init_db
 from hlam.update_prices import update_prices_get_method
 from hlam.commission_import import fetch_commissions, update_commissions_in_db
 from hlam.importexcel import import_excel_if_missing
+from backend.card_store import sync_cards
+from backend.storage import open_store
+from backend.wb_client import run
 
-# Загружаем токен
-load_dotenv("api.env")
-WB_API_KEY = os.getenv("WB_API_KEY")
-
-url = "https://content-api.wildberries.ru/content/v2/get/cards/list"
-headers = {
-    "Authorization": WB_API_KEY,
-    "Content-Type": "application/json"
-}
-
-async def fetch_and_save_cards():
-    limit = 100
-    cursor = {}
-    all_cards = []
-
-    async with httpx.AsyncClient(timeout=10) as client:
-        while True:
-            payload = {
-                "settings": {
-                    "cursor": {"limit": limit},
-                    "filter": {"withPhoto": -1}
-                }
-            }
-            if cursor:
-                payload["settings"]["cursor"].update(cursor)
 
-            response = await client.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            raw_data = response.json()
+async def fetch_and_save_cards(full: bool = False):
+    # По умолчанию докачиваем только изменённые карточки (курсор updatedAt)
+    with open_store() as store:
+        cards_info = await sync_cards(store, full=full)
+    print(f"✅ Карточек в базе: {len(cards_info)}")
 
-            cards = raw_data.get("cards", [])
-            cursor_data = raw_data.get("cursor", {})
-            total = cursor_data.get("total", 0)
 
-            all_cards.extend(cards)
+async def sync_cards_and_prices(full: bool = False):
+    # Один event loop — одно пуловое соединение на хост для обоих шагов
+    await fetch_and_save_cards(full)  # Загружаем карточки
+    await update_prices_get_method()  # Сразу обновляем цены
 
-            if total < limit:
-                break
-
-            cursor = {
-                "updatedAt": cursor_data.get("updatedAt"),
-                "nmID": cursor_data.get("nmID")
-            }
-
-    result = []
-    for card in all_cards:
-        result.append({
-            "nmID": card.get("nmID"),
-            "imtID": card.get("imtID"),
-            "vendorCode": card.get("vendorCode"),
-            "brand": card.get("brand"),
-            "subjectName": card.get("subjectName"),
-            "price": None  # цену позже обновим отдельно
-        })
-
-    save_cards_to_db(result)
-    print(f"✅ Сохранено карточек: {len(result)}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Синхронизация карточек, цен и комиссий")
+    parser.add_argument("--full", action="store_true", help="полная пересинхронизация каталога")
+    args = parser.parse_args()
+
     init_db()
-    asyncio.run(fetch_and_save_cards())  # Загружаем карточки
-    asyncio.run(update_prices_get_method())         # Сразу обновляем цены
+    run(sync_cards_and_prices(full=args.full))
     print("\n🔄 Обновляем комиссии по категориям...")
 
     try:
@@ -84,11 +44,3 @@ if __name__ == "__main__":
         print(f"❌ Ошибка при обновлении комиссий: {e}")
 
     import_excel_if_missing()
-
-
-
-
-
-
-
-
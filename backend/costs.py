@@ -0,0 +1,34 @@
+from datetime import datetime
+
+# === История себестоимости ===
+# Каждая правка — одна строка cost_versions (vendorCode, valid_from) только с теми
+# статьями, которые правились; остальные остаются NULL. Каждая статья берётся из
+# последней версии артикула, где она задана, с valid_from не позже дня продаж,
+# а без такой версии — из статей, записанных в sales при загрузке.
+# Разрешение по дням — представление sales_cost_resolved (миграция 14).
+
+
+def add_cost_version(store, vendor_code: str, valid_from: str, changes: dict) -> dict:
+    """Записывает версию себестоимости с valid_from — одна строка, история sales не трогается.
+
+    Сохраняются только переданные статьи; повторная правка той же даты дополняет версию.
+    """
+    row = {
+        "vendorCode": vendor_code,
+        "valid_from": valid_from,
+        **{field: value for field, value in changes.items() if value is not None},
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+    }
+    updates = ", ".join(f"{column} = excluded.{column}" for column in row if column not in ("vendorCode", "valid_from"))
+    store.execute(
+        f"INSERT INTO cost_versions ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})"
+        f" ON CONFLICT (vendorCode, valid_from) DO UPDATE SET {updates}",
+        tuple(row.values()),
+    )
+    return row
+
+
+def is_latest_version(store, vendor_code: str, valid_from: str) -> bool:
+    rows = store.query("SELECT MAX(valid_from) FROM cost_versions WHERE vendorCode = ?", (vendor_code,))
+    latest = rows[0][0] if rows else None
+    return latest is None or str(latest)[:10] <= valid_from
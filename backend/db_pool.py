@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import ThreadedConnectionPool
+
+# === Настройки пула ===
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+# Сколько ждать свободное соединение, прежде чем вернуть 503, сек
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Соединение, простоявшее дольше, перед выдачей проверяется SELECT 1, сек
+DB_POOL_HEALTHCHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTHCHECK_INTERVAL", "30"))
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class DBPool:
+    """Пул соединений Postgres на всё время жизни приложения.
+
+    ThreadedConnectionPool при исчерпании сразу бросает ошибку, поэтому
+    выдача ограничена семафором: запрос ждёт свободное соединение до timeout.
+    """
+
+    def __init__(self, dsn: str, minconn: int = DB_POOL_MIN, maxconn: int = DB_POOL_MAX,
+                 timeout: float = DB_POOL_TIMEOUT,
+                 healthcheck_interval: float = DB_POOL_HEALTHCHECK_INTERVAL):
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+        self._pool = ThreadedConnectionPool(minconn, maxconn, dsn)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._last_used = {}
+        self._stats = {
+            "checkouts": 0,
+            "in_use": 0,
+            "peak_in_use": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+            "reconnects": 0,
+        }
+
+    # === Выдача и возврат ===
+    @contextmanager
+    def connection(self):
+        conn = self._checkout()
+        broken = False
+        try:
+            yield conn
+        except psycopg2.Error:
+            broken = bool(conn.closed)
+            raise
+        finally:
+            self._checkin(conn, broken)
+
+    def _checkout(self):
+        started = time.monotonic()
+        waited = not self._slots.acquire(blocking=False)
+        if waited and not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise PoolTimeout(f"нет свободного соединения за {self.timeout} с")
+        wait = time.monotonic() - started
+
+        try:
+            conn = self._healthy(self._pool.getconn())
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            stats = self._stats
+            stats["checkouts"] += 1
+            stats["in_use"] += 1
+            stats["peak_in_use"] = max(stats["peak_in_use"], stats["in_use"])
+            if waited:
+                stats["waits"] += 1
+                stats["wait_time_total"] += wait
+                stats["wait_time_max"] = max(stats["wait_time_max"], wait)
+        return conn
+
+    def _healthy(self, conn):
+        # Свежие соединения не пингуем: проверка нужна только простоявшим
+        idle = time.monotonic() - self._last_used.get(id(conn), time.monotonic())
+        if not conn.closed and idle < self.healthcheck_interval:
+            return conn
+        try:
+            if conn.closed:
+                raise psycopg2.InterfaceError("connection already closed")
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return conn
+        except psycopg2.Error:
+            # Соединение порвалось (рестарт базы, idle-timeout) — заменяем новым
+            self._forget(conn)
+            self._pool.putconn(conn, close=True)
+            with self._lock:
+                self._stats["reconnects"] += 1
+            return self._pool.getconn()
+
+    def _checkin(self, conn, broken: bool = False):
+        try:
+            if not broken and not conn.closed:
+                # Незавершённая транзакция не должна достаться следующему запросу
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                self._last_used[id(conn)] = time.monotonic()
+            else:
+                self._forget(conn)
+            self._pool.putconn(conn, close=broken or bool(conn.closed))
+        finally:
+            with self._lock:
+                self._stats["in_use"] -= 1
+            self._slots.release()
+
+    def _forget(self, conn):
+        self._last_used.pop(id(conn), None)
+
+    # === Статистика ===
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["max"] = self.maxconn
+        stats["saturation"] = round(stats["in_use"] / self.maxconn, 3)
+        stats["wait_time_avg"] = round(stats["wait_time_total"] / stats["waits"], 4) if stats["waits"] else 0.0
+        stats["wait_time_total"] = round(stats["wait_time_total"], 4)
+        stats["wait_time_max"] = round(stats["wait_time_max"], 4)
+        return stats
+
+    def close(self):
+        self._pool.closeall()
@@ -0,0 +1,94 @@
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+# === Логирование загрузки ===
+# Все модули пишут в логгеры "wb.*". По умолчанию это те же строки, что раньше
+# печатались print(), на уровне INFO; подробности по строкам и батчам — DEBUG.
+# WB_LOG_JSON=1 — по JSON-объекту на строку с полями стадии (для сбора логов).
+WB_LOG_LEVEL = os.getenv("WB_LOG_LEVEL", "INFO").upper()
+WB_LOG_JSON = os.getenv("WB_LOG_JSON", "0") == "1"
+LOGGER_ROOT = "wb"
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.utcfromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        payload.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def setup_logging(level: str | None = None, json_output: bool | None = None):
+    """Настраивает логгер "wb" (повторный вызов заменяет обработчик)."""
+    logger = logging.getLogger(LOGGER_ROOT)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    handler = logging.StreamHandler(sys.stdout)
+    use_json = WB_LOG_JSON if json_output is None else json_output
+    handler.setFormatter(JsonFormatter() if use_json else logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(level or WB_LOG_LEVEL)
+    # Не дублируем строки в корневой логгер (uvicorn и прочие настраивают его сами)
+    logger.propagate = False
+    return logger
+
+
+def get_logger(name: str) -> logging.Logger:
+    if not logging.getLogger(LOGGER_ROOT).handlers:
+        setup_logging()
+    return logging.getLogger(f"{LOGGER_ROOT}.{name}")
+
+
+# === Счётчики стадий ===
+class Stage:
+    """Счётчики одной стадии (written / skipped / failed / ...) и её длительность.
+
+    context — неизменные поля стадии (период, источник), попадают в каждую сводку.
+    """
+
+    def __init__(self, logger: logging.Logger, name: str, **context):
+        self.logger = logger
+        self.name = name
+        self.context = context
+        self.counters = Counter()
+        self.started = time.perf_counter()
+
+    def add(self, **counts):
+        self.counters.update(counts)
+
+    def summary(self) -> dict:
+        return {**self.counters, "elapsed": round(time.perf_counter() - self.started, 3)}
+
+    def log(self, level: int = logging.INFO):
+        summary = self.summary()
+        counts = ", ".join(f"{key}={value}" for key, value in summary.items() if key != "elapsed")
+        label = " ".join([self.name, *(str(value) for value in self.context.values())])
+        self.logger.log(
+            level, f"📊 {label}: {counts or 'пусто'}, {summary['elapsed']:.2f} с",
+            extra={"fields": {"stage": self.name, **self.context, **summary}},
+        )
+
+
+@contextmanager
+def stage(logger: logging.Logger, name: str, **context):
+    """with stage(log, "sales") as counters: counters.add(written=...) — сводка в конце."""
+    current = Stage(logger, name, **context)
+    try:
+        yield current
+    except BaseException:
+        current.add(aborted=1)
+        current.log(logging.ERROR)
+        raise
+    current.log()
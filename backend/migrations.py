@@ -0,0 +1,461 @@
+from backend.logs import get_logger
+
+# === Объявленные схемы таблиц ===
+# Порядок важен: в таком порядке колонки создаются в новой базе
+CARDS_COLUMNS = {
+    "nmID": "INTEGER PRIMARY KEY",
+    "imtID": "INTEGER",
+    "vendorCode": "TEXT",
+    "brand": "TEXT",
+    "subjectName": "TEXT",
+    "vendorID": "INTEGER",
+    # discountedPrice у WB бывает дробной
+    "price": "REAL",
+    "salePrice": "REAL",
+    "updatedAt": "TEXT",
+    "purchase_price": "REAL",
+    "delivery_to_warehouse": "REAL",
+    "wb_commission_rub": "REAL",
+    "wb_logistics": "REAL",
+    "tax_rub": "REAL",
+    "packaging": "REAL",
+    "fuel": "REAL",
+    "gift": "REAL",
+    "defect_percent": "REAL",
+    "cost_price": "REAL",
+    "profit_per_item": "REAL",
+    "commission_percent": "REAL",
+}
+
+SALES_COLUMNS = {
+    "nm_ID": "INTEGER",
+    "date": "TEXT",
+    "imtName": "TEXT",
+    "total_profit": "REAL",
+    # nm-report/detail/history
+    "openCardCount": "INTEGER",
+    "addToCartCount": "INTEGER",
+    "addToCartConversion": "REAL",
+    "ordersCount": "INTEGER",
+    "ordersSumRub": "INTEGER",
+    "cartToOrderConversion": "REAL",
+    "buyoutsCount": "INTEGER",
+    "buyoutsSumRub": "REAL",
+    "buyoutPercent": "REAL",
+    # карточка
+    "brand": "TEXT",
+    "subjectName": "TEXT",
+    "salePrice": "REAL",
+    "purchase_price": "REAL",
+    "delivery_to_warehouse": "REAL",
+    "wb_commission_rub": "REAL",
+    "wb_logistics": "REAL",
+    "tax_rub": "REAL",
+    "packaging": "REAL",
+    "fuel": "REAL",
+    "gift": "REAL",
+    "defect_percent": "REAL",
+    "cost_price": "REAL",
+    "profit_per_item": "REAL",
+    "commission_percent": "REAL",
+    # реклама
+    "ad_views": "INTEGER",
+    "ad_clicks": "INTEGER",
+    "ad_ctr": "REAL",
+    "ad_cpc": "REAL",
+    "ad_spend": "REAL",
+    "ad_atbs": "INTEGER",
+    "ad_orders": "INTEGER",
+    "ad_cr": "REAL",
+    "ad_shks": "INTEGER",
+    "ad_sum_price": "REAL",
+    "quantity": "INTEGER",
+    "vendorCode": "TEXT",
+    "imtID": "INTEGER",
+    # поля WB, для которых ещё нет колонки (JSON)
+    "extra": "TEXT",
+}
+
+# Журнал изменений цен: пишутся только nmID, у которых цена действительно поменялась
+PRICE_CHANGE_COLUMNS = {
+    "nmID": "INTEGER",
+    "changed_at": "TEXT",
+    "old_price": "REAL",
+    "new_price": "REAL",
+    "old_salePrice": "REAL",
+    "new_salePrice": "REAL",
+}
+
+# Статистика рекламы на уровне кампании: (date, advertId, appType, nmId)
+AD_STATS_COLUMNS = {
+    "date": "TEXT",
+    "advertId": "INTEGER",
+    "appType": "INTEGER",
+    "nmId": "INTEGER",
+    "views": "INTEGER",
+    "clicks": "INTEGER",
+    "spend": "REAL",
+    "atbs": "INTEGER",
+    "orders": "INTEGER",
+    "shks": "INTEGER",
+    "sum_price": "REAL",
+}
+
+# Реестр кампаний из promotion/count (backend.campaigns)
+CAMPAIGN_COLUMNS = {
+    "advertId": "INTEGER PRIMARY KEY",
+    "type": "INTEGER",
+    "status": "INTEGER",
+    "changeTime": "TEXT",
+}
+
+# Кэш набора колонок: запись строк сверяется с ним, а не с PRAGMA table_info
+SALES_COLUMN_SET = frozenset(SALES_COLUMNS)
+
+
+# Типы SQLite -> Postgres (REAL в Postgres — float4, для денег мало)
+PG_TYPES = {
+    "INTEGER PRIMARY KEY": "BIGINT PRIMARY KEY",
+    "INTEGER": "BIGINT",
+    "REAL": "DOUBLE PRECISION",
+    "TEXT": "TEXT",
+    "TEXT NOT NULL": "TEXT NOT NULL",
+}
+# Колонки, у которых в Postgres свой тип
+PG_COLUMN_OVERRIDES = {
+    **{(table, "date"): "DATE" for table in ("sales", "ad_stats", "sales_daily_imt", "sales_daily_vendor")},
+    ("cost_versions", "valid_from"): "DATE NOT NULL",
+}
+
+
+def column_type(table: str, name: str, sql_type: str, dialect: str) -> str:
+    if dialect == "postgres":
+        return PG_COLUMN_OVERRIDES.get((table, name)) or PG_TYPES[sql_type]
+    return sql_type
+
+
+# === SQL миграций ===
+# Шаги не берут схемы агрегатов и формулу себестоимости из текущего кода: SQL каждого
+# шага зафиксирован таким, каким он был, когда шаг добавили. Иначе старая миграция,
+# применённая к новой базе, выполняла бы уже другой запрос.
+
+# Миграция 6: агрегаты {таблица: (ключ, колонки)}
+_ROLLUP_SUMS_6 = {"ordersCount": "INTEGER", "ad_spend": "REAL", "revenue": "REAL", "profit": "REAL"}
+ROLLUP_TABLES_6 = {
+    "sales_daily_imt": (
+        ("date", "imtID"),
+        {"date": "TEXT", "imtID": "INTEGER", **_ROLLUP_SUMS_6},
+    ),
+    "sales_daily_vendor": (
+        ("date", "imtID", "vendorCode"),
+        {
+            "date": "TEXT", "imtID": "INTEGER", "vendorCode": "TEXT", "row_count": "INTEGER",
+            **_ROLLUP_SUMS_6,
+            "salePrice_sum": "REAL", "cost_price_sum": "REAL",
+            "purchase_price_sum": "REAL", "delivery_to_warehouse_sum": "REAL",
+            "wb_commission_rub_sum": "REAL", "wb_logistics_sum": "REAL", "tax_rub_sum": "REAL",
+            "packaging_sum": "REAL", "fuel_sum": "REAL", "gift_sum": "REAL",
+            "defect_percent_sum": "REAL",
+        },
+    ),
+}
+
+# Миграция 7: версия хранила полный набор статей и готовую cost_price
+COST_VERSION_COLUMNS_7 = {
+    "vendorCode": "TEXT NOT NULL",
+    "valid_from": "TEXT NOT NULL",
+    "purchase_price": "REAL",
+    "delivery_to_warehouse": "REAL",
+    "wb_commission_rub": "REAL",
+    "wb_logistics": "REAL",
+    "tax_rub": "REAL",
+    "packaging": "REAL",
+    "fuel": "REAL",
+    "gift": "REAL",
+    "defect_percent": "REAL",
+    "cost_price": "REAL",
+    "created_at": "TEXT",
+}
+
+COST_RESOLVED_VIEW_SQL_7 = """
+    CREATE VIEW sales_cost_resolved AS
+    SELECT v.date, v.imtID, v.vendorCode, v.row_count, v.ordersCount, v.ad_spend,
+           v.revenue, v.cost_orders_sum,
+           cv.purchase_price, cv.delivery_to_warehouse, cv.wb_commission_rub, cv.wb_logistics,
+           cv.tax_rub, cv.packaging, cv.fuel, cv.gift, cv.defect_percent,
+           cv.cost_price,
+           v.revenue - cv.cost_price * v.ordersCount - v.ad_spend AS profit,
+           v.cost_orders_sum - cv.cost_price * v.ordersCount AS profit_delta
+    FROM sales_daily_vendor v
+    JOIN cost_versions cv
+      ON cv.vendorCode = v.vendorCode
+     AND cv.valid_from = (
+         SELECT MAX(c.valid_from) FROM cost_versions c
+         WHERE c.vendorCode = v.vendorCode AND c.valid_from <= v.date
+     )
+"""
+
+# Миграция 13: себестоимость = (рублёвые статьи + зарплата 100) * (1 + брак / 100),
+# пустой процент брака — 2
+COST_PRICE_SQL_13 = (
+    "((COALESCE(purchase_price, 0) + COALESCE(delivery_to_warehouse, 0)"
+    " + COALESCE(wb_commission_rub, 0) + COALESCE(wb_logistics, 0) + COALESCE(tax_rub, 0)"
+    " + COALESCE(packaging, 0) + COALESCE(fuel, 0) + COALESCE(gift, 0) + 100)"
+    " * (1 + COALESCE(defect_percent, 2) / 100.0))"
+)
+
+# Миграция 14: каждая статья — из последней версии, где она задана, иначе среднее за день
+_RESOLVED_FIELD_SQL_14 = """COALESCE(
+               (SELECT c.{field} FROM cost_versions c
+                WHERE c.vendorCode = v.vendorCode AND c.valid_from <= v.date AND c.{field} IS NOT NULL
+                ORDER BY c.valid_from DESC LIMIT 1),
+               v.{field}_sum / v.row_count
+           ) AS {field}"""
+_COST_FIELDS_14 = (
+    "purchase_price", "delivery_to_warehouse", "wb_commission_rub", "wb_logistics",
+    "tax_rub", "packaging", "fuel", "gift", "defect_percent",
+)
+COST_RESOLVED_VIEW_SQL_14 = f"""
+    CREATE VIEW sales_cost_resolved AS
+    SELECT r.date, r.imtID, r.vendorCode, r.row_count, r.ordersCount, r.ad_spend,
+           r.revenue, r.cost_orders_sum,
+           {", ".join(f"r.{field}" for field in _COST_FIELDS_14)},
+           {COST_PRICE_SQL_13} AS cost_price,
+           r.revenue - {COST_PRICE_SQL_13} * r.ordersCount - r.ad_spend AS profit,
+           r.cost_orders_sum - {COST_PRICE_SQL_13} * r.ordersCount AS profit_delta
+    FROM (
+        SELECT v.date, v.imtID, v.vendorCode, v.row_count, v.ordersCount, v.ad_spend,
+               v.revenue, v.cost_orders_sum,
+               {", ".join(_RESOLVED_FIELD_SQL_14.format(field=field) for field in _COST_FIELDS_14)}
+        FROM sales_daily_vendor v
+        WHERE EXISTS (
+            SELECT 1 FROM cost_versions c
+            WHERE c.vendorCode = v.vendorCode AND c.valid_from <= v.date
+        )
+    ) r
+"""
+
+# Миграция 15: агрегаты из всей истории sales
+_PROFIT_SQL_15 = (
+    f"(COALESCE(salePrice, 0) - {COST_PRICE_SQL_13}) * COALESCE(ordersCount, 0) - COALESCE(ad_spend, 0)"
+)
+ROLLUP_INSERT_SQL_15 = {
+    "sales_daily_imt": f"""
+        INSERT INTO sales_daily_imt (date, imtID, ordersCount, ad_spend, revenue, profit)
+        SELECT date, COALESCE(imtID, 0),
+               SUM(COALESCE(ordersCount, 0)), SUM(COALESCE(ad_spend, 0)),
+               SUM(COALESCE(salePrice, 0) * COALESCE(ordersCount, 0)), SUM({_PROFIT_SQL_15})
+        FROM sales
+        GROUP BY date, COALESCE(imtID, 0)
+    """,
+    "sales_daily_vendor": f"""
+        INSERT INTO sales_daily_vendor (
+            date, imtID, vendorCode, row_count, ordersCount, ad_spend, revenue, profit,
+            salePrice_sum, cost_price_sum, cost_orders_sum,
+            purchase_price_sum, delivery_to_warehouse_sum, wb_commission_rub_sum, wb_logistics_sum,
+            tax_rub_sum, packaging_sum, fuel_sum, gift_sum, defect_percent_sum
+        )
+        SELECT date, COALESCE(imtID, 0), COALESCE(vendorCode, ''), COUNT(*),
+               SUM(COALESCE(ordersCount, 0)), SUM(COALESCE(ad_spend, 0)),
+               SUM(COALESCE(salePrice, 0) * COALESCE(ordersCount, 0)), SUM({_PROFIT_SQL_15}),
+               SUM(COALESCE(salePrice, 0)), SUM({COST_PRICE_SQL_13}),
+               SUM({COST_PRICE_SQL_13} * COALESCE(ordersCount, 0)),
+               SUM(COALESCE(purchase_price, 0)), SUM(COALESCE(delivery_to_warehouse, 0)),
+               SUM(COALESCE(wb_commission_rub, 0)), SUM(COALESCE(wb_logistics, 0)),
+               SUM(COALESCE(tax_rub, 0)), SUM(COALESCE(packaging, 0)), SUM(COALESCE(fuel, 0)),
+               SUM(COALESCE(gift, 0)), SUM(COALESCE(defect_percent, 2))
+        FROM sales
+        GROUP BY date, COALESCE(imtID, 0), COALESCE(vendorCode, '')
+    """,
+}
+
+
+# === Шаги миграций ===
+# Каждый шаг получает соединение и диалект ("sqlite" или "postgres")
+def _create_table(conn, dialect: str, table: str, columns: dict):
+    body = ",\n    ".join(
+        f"{name} {column_type(table, name, sql_type, dialect)}" for name, sql_type in columns.items()
+    )
+    _execute(conn, f"CREATE TABLE IF NOT EXISTS {table} (\n    {body}\n)")
+
+
+def _add_missing_columns(conn, dialect: str, table: str, columns: dict):
+    # Старые базы создавались с другим набором колонок — добавляем недостающие
+    for name, sql_type in columns.items():
+        sql_type = column_type(table, name, sql_type, dialect).replace("PRIMARY KEY", "").strip()
+        if dialect == "postgres":
+            _execute(conn, f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {name} {sql_type}")
+            continue
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}")
+
+
+def _execute(conn, sql: str):
+    # У sqlite3.Connection есть execute, у psycopg2 — только через курсор
+    cursor = conn.cursor()
+    cursor.execute(sql)
+    cursor.close()
+
+
+def _cards_table(conn, dialect):
+    _create_table(conn, dialect, "cards", CARDS_COLUMNS)
+    _add_missing_columns(conn, dialect, "cards", CARDS_COLUMNS)
+
+
+def _sales_table(conn, dialect):
+    _create_table(conn, dialect, "sales", SALES_COLUMNS)
+    _add_missing_columns(conn, dialect, "sales", SALES_COLUMNS)
+
+
+def _sales_unique_key(conn, dialect):
+    # Старые прогоны могли оставить дубли — оставляем последнюю запись
+    if dialect == "postgres":
+        _execute(conn, """
+            DELETE FROM sales a USING sales b
+            WHERE a.ctid < b.ctid AND a.nm_ID = b.nm_ID AND a.date = b.date
+        """)
+    else:
+        _execute(conn, """
+            DELETE FROM sales
+            WHERE rowid NOT IN (SELECT MAX(rowid) FROM sales GROUP BY nm_ID, date)
+        """)
+    _execute(conn, "CREATE UNIQUE INDEX IF NOT EXISTS ux_sales_nm_date ON sales (nm_ID, date)")
+
+
+def _sync_state(conn, dialect):
+    _execute(conn, """
+        CREATE TABLE IF NOT EXISTS sync_state (
+            name TEXT PRIMARY KEY,
+            cursor TEXT
+        )
+    """)
+
+
+def _backfill_checkpoints(conn, dialect):
+    _execute(conn, """
+        CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+            source TEXT NOT NULL,
+            period_begin TEXT NOT NULL,
+            period_end TEXT NOT NULL,
+            batch_key TEXT NOT NULL,
+            row_count INTEGER DEFAULT 0,
+            committed_at TEXT,
+            PRIMARY KEY (source, period_begin, period_end, batch_key)
+        )
+    """)
+
+
+def _sales_rollups(conn, dialect):
+    # Агрегаты заполняются один раз — последней миграцией (_rebuild_rollups)
+    for table, (key, columns) in ROLLUP_TABLES_6.items():
+        _create_table(conn, dialect, table, columns)
+        _execute(conn, f"CREATE UNIQUE INDEX IF NOT EXISTS ux_{table} ON {table} ({', '.join(key)})")
+
+
+def _cost_versions(conn, dialect):
+    # Агрегатам нужна себестоимость заказов, чтобы подменять её версией
+    _add_missing_columns(conn, dialect, "sales_daily_vendor", {"cost_orders_sum": "REAL"})
+    _create_table(conn, dialect, "cost_versions", COST_VERSION_COLUMNS_7)
+    _execute(conn, "CREATE UNIQUE INDEX IF NOT EXISTS ux_cost_versions ON cost_versions (vendorCode, valid_from)")
+    _execute(conn, COST_RESOLVED_VIEW_SQL_7)
+
+
+def _price_changes(conn, dialect):
+    _create_table(conn, dialect, "price_changes", PRICE_CHANGE_COLUMNS)
+    _execute(conn, "CREATE INDEX IF NOT EXISTS ix_price_changes_nm ON price_changes (nmID, changed_at)")
+
+
+def _ad_stats(conn, dialect):
+    _create_table(conn, dialect, "ad_stats", AD_STATS_COLUMNS)
+    _execute(conn, "CREATE UNIQUE INDEX IF NOT EXISTS ux_ad_stats ON ad_stats (date, advertId, appType, nmId)")
+
+
+def _campaigns(conn, dialect):
+    _create_table(conn, dialect, "campaigns", CAMPAIGN_COLUMNS)
+
+
+def _cards_price_real(conn, dialect):
+    # В Postgres INTEGER -> BIGINT не принимает дробную цену. SQLite хранит дробное
+    # значение и в колонке INTEGER как REAL, так что там менять нечего
+    if dialect == "postgres":
+        _execute(conn, """
+            ALTER TABLE cards
+                ALTER COLUMN price TYPE DOUBLE PRECISION,
+                ALTER COLUMN salePrice TYPE DOUBLE PRECISION
+        """)
+
+
+def _sales_date_index(conn, dialect):
+    # Пересчёт агрегатов выбирает строки sales по (день, связка) — без индекса это полный скан.
+    # Ведущая колонка date обслуживает и выборки только по дням
+    _execute(conn, "CREATE INDEX IF NOT EXISTS ix_sales_date_imt ON sales (date, (COALESCE(imtID, 0)))")
+
+
+def _single_cost_formula(conn, dialect):
+    # Кэш карточек пересчитывается по общей формуле. История sales не переписывается:
+    # агрегаты считают прибыль из статей строки, а не из её total_profit
+    _execute(conn, f"""
+        UPDATE cards
+        SET cost_price = {COST_PRICE_SQL_13},
+            profit_per_item = COALESCE(salePrice, 0) - {COST_PRICE_SQL_13}
+        WHERE salePrice IS NOT NULL
+    """)
+
+
+def _partial_cost_versions(conn, dialect):
+    # Версия хранит только правленые статьи, остальные берутся по дням из агрегата:
+    # представление пересоздаётся, а готовая cost_price версии больше не нужна
+    _execute(conn, "DROP VIEW IF EXISTS sales_cost_resolved")
+    if dialect == "postgres":
+        _execute(conn, "ALTER TABLE cost_versions DROP COLUMN IF EXISTS cost_price")
+    elif "cost_price" in {row[1] for row in conn.execute("PRAGMA table_info(cost_versions)")}:
+        conn.execute("ALTER TABLE cost_versions DROP COLUMN cost_price")
+    _execute(conn, COST_RESOLVED_VIEW_SQL_14)
+
+
+def _rebuild_rollups(conn, dialect):
+    # Единственная полная пересборка агрегатов: после неё они ведутся по затронутым ключам
+    for table, insert_sql in ROLLUP_INSERT_SQL_15.items():
+        _execute(conn, f"DELETE FROM {table}")
+        _execute(conn, insert_sql)
+
+
+# Новые миграции добавляются только в конец списка
+MIGRATIONS = [
+    (1, "cards", _cards_table),
+    (2, "sales", _sales_table),
+    (3, "sales unique (nm_ID, date)", _sales_unique_key),
+    (4, "sync_state", _sync_state),
+    (5, "backfill_checkpoints", _backfill_checkpoints),
+    (6, "sales_daily_imt / sales_daily_vendor", _sales_rollups),
+    (7, "cost_versions", _cost_versions),
+    (8, "price_changes", _price_changes),
+    (9, "ad_stats", _ad_stats),
+    (10, "campaigns", _campaigns),
+    (11, "cards.price / salePrice REAL", _cards_price_real),
+    (12, "sales index (date, imtID)", _sales_date_index),
+    (13, "one cost formula for stored and aggregated profit", _single_cost_formula),
+    (14, "cost_versions keep only edited fields", _partial_cost_versions),
+    (15, "rebuild sales_daily_imt / sales_daily_vendor", _rebuild_rollups),
+]
+
+
+log = get_logger("migrations")
+
+
+def apply_migrations(conn, dialect: str = "sqlite"):
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+    cursor.execute("SELECT MAX(version) FROM schema_version")
+    current = cursor.fetchone()[0] or 0
+    placeholder = "%s" if dialect == "postgres" else "?"
+    for version, name, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        migrate(conn, dialect)
+        cursor.execute(f"INSERT INTO schema_version (version) VALUES ({placeholder})", (version,))
+        conn.commit()
+        log.info(f"🛠 Миграция {version}: {name}")
+    conn.commit()
+    cursor.close()
@@ -0,0 +1,283 @@
+import argparse
+import asyncio
+import math
+import random
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from fastapi import Body, FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from backend.rate_limit import ENDPOINT_QUOTAS, TokenBucket, scale_quotas
+from backend.wb_api import ACTIVE_CAMPAIGN_STATUSES, FULLSTATS_CHUNK_SIZE, SALES_BATCH_SIZE
+
+# === Локальная замена WB API ===
+# Те же пути и форматы, что у content / nm-report / advert / prices / commission:
+# курсорная и offset-пагинация, квоты из rate_limit, задержка и инжекция 429/5xx.
+# Каталог синтетический и детерминированный: один seed — одни и те же ответы.
+#
+#   python -m backend.mock_wb --cards 10000 --port 8800 --quota-scale 100
+#   WB_BASE_URL=http://127.0.0.1:8800 WB_QUOTA_SCALE=100 WB_API_KEY=mock python test_cycle.py
+
+SUBJECTS = {"Футболки": 25.0, "Худи": 27.0, "Носки": 22.0, "Шорты": 24.5, "Кепки": 23.0}
+BRANDS = ["MockBrand", "Тестовый бренд", "Noname"]
+NM_PER_IMT = 3
+NM_PER_CAMPAIGN = 20
+FIRST_NM_ID = 100000
+CATALOG_UPDATED_AT = datetime(2025, 6, 1)
+
+
+@dataclass
+class MockConfig:
+    cards: int = 1000
+    seed: int = 1
+    latency: float = 0.05  # базовая задержка ответа, сек
+    jitter: float = 0.02  # случайная добавка к задержке, сек
+    rate_429: float = 0.0  # доля запросов, на которые отвечаем 429
+    rate_5xx: float = 0.0  # доля запросов, на которые отвечаем 503
+    quota_scale: float = 1.0  # множитель документированных квот WB
+    rate_limits: bool = True  # отвечать 429 при превышении квоты
+
+
+# === Синтетический каталог ===
+class SyntheticCatalog:
+    def __init__(self, size: int, seed: int = 1):
+        self.seed = seed
+        rng = random.Random(seed)
+        subjects = list(SUBJECTS)
+        self.cards = []
+        self.prices = {}
+        for i in range(size):
+            nm_id = FIRST_NM_ID + i
+            # cards/list отдаёт каталог по убыванию updatedAt — так и храним
+            self.cards.append({
+                "nmID": nm_id,
+                "imtID": FIRST_NM_ID // 2 + i // NM_PER_IMT,
+                "vendorCode": f"mock-{i}",
+                "brand": rng.choice(BRANDS),
+                "subjectName": subjects[i % len(subjects)],
+                "title": f"Товар {i}",
+                "updatedAt": (CATALOG_UPDATED_AT - timedelta(minutes=i)).isoformat() + "Z",
+            })
+            price = rng.randrange(800, 5000, 10)
+            self.prices[nm_id] = (price, rng.choice((0, 10, 20, 30, 45)))
+        self.position = {card["nmID"]: i for i, card in enumerate(self.cards)}
+        self.campaigns = self._campaigns(rng)
+
+    def _campaigns(self, rng) -> list:
+        campaigns = []
+        for i in range(max(1, len(self.cards) // NM_PER_CAMPAIGN)):
+            status = rng.choices((9, 11, 7), weights=(3, 1, 6))[0]
+            changed = CATALOG_UPDATED_AT - timedelta(days=rng.randint(0, 365))
+            first = i * NM_PER_CAMPAIGN
+            campaigns.append({
+                "advertId": 9000000 + i,
+                "type": 8,
+                "status": status,
+                "changeTime": changed.isoformat() + "+03:00",
+                "nmIDs": [card["nmID"] for card in self.cards[first:first + NM_PER_CAMPAIGN]],
+            })
+        return campaigns
+
+    def _rng(self, *key) -> random.Random:
+        return random.Random(":".join(str(part) for part in (self.seed, *key)))
+
+    def history(self, nm_id: int, day: str) -> dict:
+        rng = self._rng("sales", nm_id, day)
+        price, discount = self.prices.get(nm_id, (1000, 0))
+        opens = rng.randint(0, 400)
+        carts = rng.randint(0, opens // 5 + 1)
+        orders = rng.randint(0, carts)
+        buyouts = rng.randint(0, orders)
+        sale_price = round(price * (100 - discount) / 100)
+        return {
+            "dt": day,
+            "openCardCount": opens,
+            "addToCartCount": carts,
+            "addToCartConversion": round(carts / opens * 100) if opens else 0,
+            "ordersCount": orders,
+            "ordersSumRub": orders * sale_price,
+            "cartToOrderConversion": round(orders / carts * 100) if carts else 0,
+            "buyoutsCount": buyouts,
+            "buyoutsSumRub": buyouts * sale_price,
+            "buyoutPercent": round(buyouts / orders * 100) if orders else 0,
+        }
+
+    def fullstats(self, campaign: dict, day: str) -> dict:
+        nm = []
+        for nm_id in campaign["nmIDs"]:
+            rng = self._rng("ad", campaign["advertId"], nm_id, day)
+            views = rng.randint(0, 3000)
+            clicks = rng.randint(0, views // 20 + 1)
+            orders = rng.randint(0, clicks // 5 + 1)
+            nm.append({
+                "nmId": nm_id, "name": f"Товар {nm_id - FIRST_NM_ID}",
+                "views": views, "clicks": clicks, "sum": round(clicks * rng.uniform(3, 15), 2),
+                "atbs": rng.randint(0, clicks), "orders": orders, "shks": orders,
+                "sum_price": orders * self.prices[nm_id][0],
+            })
+        return {"date": day + "T00:00:00+03:00", "apps": [{"appType": 1, "nm": nm}]}
+
+
+def _days(begin: str, end: str) -> list:
+    first, last = date.fromisoformat(begin[:10]), date.fromisoformat(end[:10])
+    return [(first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1)]
+
+
+def _error(status: int, text: str, **headers) -> JSONResponse:
+    return JSONResponse({"title": text, "status": status}, status_code=status, headers=headers)
+
+
+# === Приложение ===
+def create_app(config: MockConfig | None = None) -> FastAPI:
+    config = config or MockConfig()
+    catalog = SyntheticCatalog(config.cards, config.seed)
+    quotas = scale_quotas({path: quota for (_, path), quota in ENDPOINT_QUOTAS.items()}, config.quota_scale)
+    buckets = {path: TokenBucket(quota) for path, quota in quotas.items()}
+    rng = random.Random(config.seed)
+    stats = Counter()
+    app = FastAPI(title="WB API mock")
+    app.state.catalog = catalog
+    app.state.stats = stats
+
+    @app.middleware("http")
+    async def emulate_network(request: Request, call_next):
+        path = request.url.path
+        if path.startswith("/mock/"):
+            return await call_next(request)
+        stats["requests"] += 1
+        await asyncio.sleep(config.latency + rng.uniform(0, config.jitter))
+
+        bucket = buckets.get(path)
+        if config.rate_limits and bucket is not None:
+            delay = bucket.try_acquire()
+            if delay > 0:
+                stats["rate_limited"] += 1
+                return _error(429, "too many requests", **{
+                    "X-Ratelimit-Retry": str(math.ceil(delay)), "X-Ratelimit-Remaining": "0",
+                })
+        if rng.random() < config.rate_429:
+            stats["injected_429"] += 1
+            return _error(429, "too many requests (injected)", **{"X-Ratelimit-Retry": "1"})
+        if rng.random() < config.rate_5xx:
+            stats["injected_5xx"] += 1
+            return _error(503, "service unavailable (injected)")
+        return await call_next(request)
+
+    @app.get("/mock/stats")
+    async def mock_stats():
+        return dict(stats)
+
+    # --- Content API: курсор (updatedAt, nmID) по убыванию updatedAt ---
+    @app.post("/content/v2/get/cards/list")
+    async def cards_list(payload: dict = Body(...)):
+        cursor = payload.get("settings", {}).get("cursor", {})
+        limit = min(int(cursor.get("limit", 100)), 100)
+        start = catalog.position.get(cursor.get("nmID"), -1) + 1 if cursor.get("nmID") else 0
+        page = catalog.cards[start:start + limit]
+        last = page[-1] if page else {}
+        return {
+            "cards": page,
+            "cursor": {"updatedAt": last.get("updatedAt"), "nmID": last.get("nmID"), "total": len(page)},
+        }
+
+    # --- Analytics: nm-report по дням ---
+    @app.post("/api/v2/nm-report/detail/history")
+    async def nm_report_history(payload: dict = Body(...)):
+        nm_ids = payload.get("nmIDs") or []
+        if len(nm_ids) > SALES_BATCH_SIZE:
+            return _error(400, f"nmIDs: не больше {SALES_BATCH_SIZE}")
+        period = payload.get("period", {})
+        days = _days(period["begin"], period.get("end") or period["begin"])
+        data = []
+        for nm_id in nm_ids:
+            if nm_id not in catalog.position:
+                continue
+            card = catalog.cards[catalog.position[nm_id]]
+            data.append({
+                "nmID": nm_id,
+                "imtName": card["title"],
+                "vendorCode": card["vendorCode"],
+                "history": [catalog.history(nm_id, day) for day in days],
+            })
+        return {"data": data, "error": False}
+
+    # --- Advert API ---
+    @app.get("/adv/v1/promotion/count")
+    async def promotion_count():
+        groups = {}
+        for campaign in catalog.campaigns:
+            group = groups.setdefault((campaign["type"], campaign["status"]), {
+                "type": campaign["type"], "status": campaign["status"], "count": 0, "advert_list": [],
+            })
+            group["count"] += 1
+            group["advert_list"].append({"advertId": campaign["advertId"], "changeTime": campaign["changeTime"]})
+        return {"adverts": list(groups.values()), "all": len(catalog.campaigns)}
+
+    @app.post("/adv/v2/fullstats")
+    async def fullstats(payload: list = Body(...)):
+        if len(payload) > FULLSTATS_CHUNK_SIZE:
+            return _error(400, f"не больше {FULLSTATS_CHUNK_SIZE} кампаний в запросе")
+        by_id = {campaign["advertId"]: campaign for campaign in catalog.campaigns}
+        result = []
+        for item in payload:
+            campaign = by_id.get(item.get("id"))
+            if campaign is None:
+                continue
+            # Статистика есть только за дни, когда кампания могла крутиться
+            days = [
+                day for day in item.get("dates", [])
+                if campaign["status"] in ACTIVE_CAMPAIGN_STATUSES or campaign["changeTime"][:10] >= day
+            ]
+            if days:
+                result.append({"advertId": campaign["advertId"], "days": [catalog.fullstats(campaign, d) for d in days]})
+        return result
+
+    # --- Prices API: offset-пагинация ---
+    @app.get("/api/v2/list/goods/filter")
+    async def goods_filter(limit: int = 1000, offset: int = 0):
+        goods = []
+        for card in catalog.cards[offset:offset + min(limit, 1000)]:
+            price, discount = catalog.prices[card["nmID"]]
+            goods.append({
+                "nmID": card["nmID"],
+                "vendorCode": card["vendorCode"],
+                "discount": discount,
+                "sizes": [{"sizeID": card["nmID"] * 10, "price": price,
+                           "discountedPrice": round(price * (100 - discount) / 100, 2)}],
+            })
+        return {"data": {"listGoods": goods}}
+
+    # --- Common API: комиссии по категориям ---
+    @app.get("/api/v1/tariffs/commission")
+    async def commission(locale: str = "ru"):
+        return {"report": [
+            {"subjectName": subject, "kgvpSupplier": percent, "parentName": "Одежда"}
+            for subject, percent in SUBJECTS.items()
+        ]}
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Локальный mock WB API")
+    parser.add_argument("--cards", type=int, default=1000, help="размер синтетического каталога")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка ответа, сек")
+    parser.add_argument("--jitter", type=float, default=0.02, help="случайная добавка к задержке, сек")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="доля запросов с инжектированным 429")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="доля запросов с инжектированным 503")
+    parser.add_argument("--quota-scale", type=float, default=1.0,
+                        help="множитель квот WB (клиенту — тот же WB_QUOTA_SCALE)")
+    parser.add_argument("--no-rate-limits", action="store_true", help="не ограничивать частоту запросов")
+    args = parser.parse_args()
+    config = MockConfig(
+        cards=args.cards, seed=args.seed, latency=args.latency, jitter=args.jitter,
+        rate_429=args.rate_429, rate_5xx=args.rate_5xx, quota_scale=args.quota_scale,
+        rate_limits=not args.no_rate_limits,
+    )
+    uvicorn.run(create_app(config), host="127.0.0.1", port=args.port)
@@ -0,0 +1,112 @@
+import asyncio
+import os
+from datetime import date, timedelta
+
+from backend.ad_stats import get_stored_ad_metrics
+from backend.logs import get_logger, stage
+from backend.storage import enrich_sales_rows, load_card_details, normalize_sales, upsert_sales
+from backend.wb_api import SALES_BATCH_SIZE, iter_sales_batches
+
+# Сколько батчей может ждать между стадиями: память ограничена, а не растёт с каталогом
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+
+_DONE = object()
+
+log = get_logger("pipeline")
+
+
+async def _to_thread_to_end(func, *args):
+    """asyncio.to_thread, который при отмене дожидается конца вызова.
+
+    Поток не прервать: отменённая задача иначе оставила бы его писать в store,
+    который вызывающий уже закрыл.
+    """
+    future = asyncio.ensure_future(asyncio.to_thread(func, *args))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        await asyncio.wait([future])
+        raise
+
+
+# === Конвейер загрузки продаж ===
+# fetch -> normalize -> enrich -> write, стадии связаны ограниченными очередями.
+# Каждый батч коммитится, пока следующие ещё качаются, поэтому падение в конце
+# не теряет уже записанное.
+async def run_sales_pipeline(store, nm_ids: list, cards_info: dict, begin: str, end: str | None = None,
+                             batches: list | None = None, failed: list | None = None,
+                             on_written=None, queue_size: int = PIPELINE_QUEUE_SIZE) -> dict:
+    """Загружает nm-report за период в sales и возвращает счётчики {batches, rows}.
+
+    batches — готовые батчи nmID (например, из plan_batches), иначе nm_ids режутся
+    по SALES_BATCH_SIZE. on_written(batch, rows) вызывается после коммита батча.
+    """
+    end = end or begin
+    if batches is None:
+        batches = [nm_ids[i:i + SALES_BATCH_SIZE] for i in range(0, len(nm_ids), SALES_BATCH_SIZE)]
+    first, last = date.fromisoformat(begin), date.fromisoformat(end)
+    dates = [(first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1)]
+
+    card_details = await asyncio.to_thread(load_card_details, store)
+
+    async def load_ads():
+        try:
+            return await get_stored_ad_metrics(store, dates)
+        except Exception as err:
+            log.error(f"❌ Реклама за {begin}..{end} не прочитана, продажи пишутся без неё: {err}")
+            return {}
+
+    # Реклама качается (и сохраняется в ad_stats) параллельно с продажами. Стадия write
+    # ждёт её через enrich, так что store до конца синхронизации рекламы больше никто не трогает
+    ad_task = asyncio.create_task(load_ads())
+    raw_queue = asyncio.Queue(queue_size)
+    normalized_queue = asyncio.Queue(queue_size)
+    enriched_queue = asyncio.Queue(queue_size)
+    stats = {"batches": 0, "rows": 0}
+    failed = [] if failed is None else failed
+    failed_before = len(failed)
+
+    async def fetch():
+        async for batch, data in iter_sales_batches(batches, begin, end, failed=failed):
+            await raw_queue.put((batch, data))
+        await raw_queue.put(_DONE)
+
+    async def normalize():
+        while (item := await raw_queue.get()) is not _DONE:
+            batch, data = item
+            await normalized_queue.put((batch, normalize_sales(data, cards_info)))
+        await normalized_queue.put(_DONE)
+
+    async def enrich():
+        # Рекламу ждём сразу, а не с первым батчем: без батчей её синхронизация не должна теряться
+        ad_by_day = await asyncio.shield(ad_task)
+        while (item := await normalized_queue.get()) is not _DONE:
+            batch, rows = item
+            await enriched_queue.put((batch, enrich_sales_rows(rows, ad_by_day, card_details)))
+        await enriched_queue.put(_DONE)
+
+    async def write():
+        while (item := await enriched_queue.get()) is not _DONE:
+            batch, rows = item
+            # Запись в потоке: цикл тем временем продолжает качать следующие батчи
+            await _to_thread_to_end(upsert_sales, store, rows)
+            if on_written is not None:
+                await _to_thread_to_end(on_written, batch, rows)
+            stats["batches"] += 1
+            stats["rows"] += len(rows)
+            log.debug(f"💾 Записан батч {stats['batches']}: {len(rows)} строк")
+
+    with stage(log, "sales_pipeline", period=f"{begin}..{end}") as counters:
+        tasks = [asyncio.create_task(step()) for step in (fetch, normalize, enrich, write)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # Упала одна стадия — останавливаем остальные, иначе они ждут очередь вечно.
+            # Начатая запись батча дописывается, а рекламу не отменяем вовсе — дожидаемся,
+            # чтобы её запись в ad_stats не пережила store
+            for task in tasks:
+                task.cancel()
+            await asyncio.wait(tasks)
+            await asyncio.shield(ad_task)
+            counters.add(batches=stats["batches"], written=stats["rows"], failed=len(failed) - failed_before)
+    return stats
@@ -0,0 +1,97 @@
+import numpy as np
+
+# === Единый расчёт прибыли ===
+# Одна формула себестоимости в двух видах: над массивами NumPy (загрузка, пересчёт
+# карточек) и как SQL-выражение (агрегаты, API), поэтому sales.total_profit и прибыль
+# дашборда совпадают:
+#   себестоимость = (рублёвые статьи + зарплата) * (1 + процент брака / 100)
+# Пустые статьи считаются нулями, пустой процент брака — DEFECT_PERCENT.
+
+# Рублёвые статьи себестоимости единицы товара
+COST_ITEM_FIELDS = [
+    "purchase_price", "delivery_to_warehouse", "wb_commission_rub", "wb_logistics",
+    "tax_rub", "packaging", "fuel", "gift",
+]
+# Статьи, хранящиеся в cards / sales / cost_versions
+COST_FIELDS = [*COST_ITEM_FIELDS, "defect_percent"]
+
+# Параметры пересчёта
+TAX_PERCENT = 12  # Процент налога
+DEFECT_PERCENT = 2  # Процент брака, если у карточки он не задан
+SALARY_PER_ITEM = 100  # Зарплата на единицу товара
+
+
+def as_array(values, default: float = 0.0) -> np.ndarray:
+    """Список / Series / скаляр -> float-массив, None и NaN -> default."""
+    return np.nan_to_num(np.asarray(values, dtype=float), nan=default)
+
+
+# === Векторные формулы ===
+def cost_price(components) -> np.ndarray:
+    """Себестоимость единицы по статьям COST_FIELDS.
+
+    components — dict или DataFrame {статья: массив}; отсутствующие статьи — 0.
+    """
+    total = 0.0
+    for field in COST_ITEM_FIELDS:
+        if field in components:
+            total = total + as_array(components[field])
+    defect = DEFECT_PERCENT
+    if "defect_percent" in components:
+        defect = as_array(components["defect_percent"], DEFECT_PERCENT)
+    return as_array((total + SALARY_PER_ITEM) * (1 + defect / 100))
+
+
+def unit_profit(sale_price, cost) -> np.ndarray:
+    return as_array(sale_price) - as_array(cost)
+
+
+def total_profit(unit, orders, ad_spend) -> np.ndarray:
+    """Прибыль строки продаж: прибыль с единицы * заказы - реклама."""
+    return as_array(unit) * as_array(orders) - as_array(ad_spend)
+
+
+def card_costs(sale_price, components, commission_percent, tax_percent: float = TAX_PERCENT) -> dict:
+    """Пересчёт карточек по цене со скидкой.
+
+    Налог и комиссия WB считаются от цены, себестоимость — по cost_price.
+    Пустой процент брака заменяется на DEFECT_PERCENT и возвращается, чтобы
+    в cards (а из них в sales) попало то же значение, что вошло в расчёт.
+    """
+    sale_price = as_array(sale_price)
+    tax_rub = sale_price * tax_percent / 100
+    wb_commission_rub = sale_price * as_array(commission_percent) / 100
+    defect_percent = as_array(components.get("defect_percent"), DEFECT_PERCENT) * np.ones_like(sale_price)
+    cost = cost_price({
+        **components, "tax_rub": tax_rub, "wb_commission_rub": wb_commission_rub,
+        "defect_percent": defect_percent,
+    })
+    return {
+        "tax_rub": tax_rub,
+        "wb_commission_rub": wb_commission_rub,
+        "defect_percent": defect_percent,
+        "cost_price": cost,
+        "profit_per_item": unit_profit(sale_price, cost),
+    }
+
+
+# === Те же формулы в SQL ===
+def _column(name: str, alias: str = "") -> str:
+    return f"COALESCE({alias + '.' if alias else ''}{name}, 0)"
+
+
+def cost_price_sql(alias: str = "") -> str:
+    items = " + ".join(_column(field, alias) for field in COST_ITEM_FIELDS)
+    defect = f"COALESCE({alias + '.' if alias else ''}defect_percent, {DEFECT_PERCENT})"
+    return f"(({items} + {SALARY_PER_ITEM}) * (1 + {defect} / 100.0))"
+
+
+def unit_profit_sql(alias: str = "", cost: str | None = None) -> str:
+    return f"({_column('salePrice', alias)} - {cost or cost_price_sql(alias)})"
+
+
+def total_profit_sql(alias: str = "", unit: str | None = None) -> str:
+    return (
+        f"({unit or unit_profit_sql(alias)} * {_column('ordersCount', alias)}"
+        f" - {_column('ad_spend', alias)})"
+    )
@@ -0,0 +1,160 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Quota:
+    requests: int  # сколько запросов разрешено за окно
+    period: float  # длина окна, сек
+    burst: int  # сколько запросов можно отправить подряд без ожидания
+
+
+# === Документированные лимиты WB API ===
+# Ключ — (хост, путь); если пути нет в таблице, берётся лимит хоста
+ENDPOINT_QUOTAS = {
+    ("content", "/content/v2/get/cards/list"): Quota(100, 60, 5),
+    ("analytics", "/api/v2/nm-report/detail/history"): Quota(3, 60, 3),
+    ("advert", "/adv/v1/promotion/count"): Quota(5, 1, 5),
+    ("advert", "/adv/v2/fullstats"): Quota(3, 60, 1),
+    ("prices", "/api/v2/list/goods/filter"): Quota(10, 6, 5),
+    ("common", "/api/v1/tariffs/commission"): Quota(1, 60, 1),
+}
+
+HOST_QUOTAS = {
+    "content": Quota(100, 60, 5),
+    "analytics": Quota(3, 60, 3),
+    "advert": Quota(5, 1, 5),
+    "prices": Quota(10, 6, 5),
+    "common": Quota(1, 60, 1),
+}
+
+DEFAULT_QUOTA = Quota(1, 1, 1)
+
+# Множитель квот — только для локального mock-сервера (backend.mock_wb), с настоящим WB не трогать
+WB_QUOTA_SCALE = float(os.getenv("WB_QUOTA_SCALE", "1"))
+
+
+def scale_quotas(quotas: dict, scale: float) -> dict:
+    """Квоты с частотой, умноженной на scale (burst растёт так же, но не меньше исходного)."""
+    if scale == 1:
+        return quotas
+    return {
+        key: Quota(quota.requests * scale, quota.period, max(quota.burst, int(quota.burst * scale)))
+        for key, quota in quotas.items()
+    }
+
+
+class TokenBucket:
+    """Асинхронный token bucket: запрос уходит, как только в корзине есть токен."""
+
+    def __init__(self, quota: Quota, clock=time.monotonic):
+        self.quota = quota
+        self.rate = quota.requests / quota.period
+        self.capacity = quota.burst
+        self.tokens = float(quota.burst)
+        self.blocked_until = 0.0
+        self._clock = clock
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _delay(self) -> float:
+        """Сколько ждать до следующего токена (0 — можно отправлять сразу)."""
+        self._refill()
+        now = self._clock()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def try_acquire(self) -> float:
+        """Без ожидания: 0 — токен взят, иначе через сколько секунд он появится."""
+        delay = self._delay()
+        if delay <= 0:
+            self.tokens -= 1
+        return max(delay, 0.0)
+
+    async def acquire(self):
+        # Лок держим и во время ожидания: запросы уходят строго в порядке очереди
+        async with self._lock:
+            while True:
+                delay = self._delay()
+                if delay <= 0:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep(delay)
+
+    def pause(self, seconds: float):
+        """Заблокировать корзину на seconds (Retry-After / X-Ratelimit-Retry)."""
+        self._refill()
+        self.tokens = 0.0
+        self.blocked_until = max(self.blocked_until, self._clock() + seconds)
+
+    def sync_remaining(self, remaining: int):
+        """Сервер лучше знает остаток квоты — не даём локальной корзине быть оптимистичнее."""
+        self._refill()
+        self.tokens = min(self.tokens, float(remaining))
+
+
+def _header_float(headers, name: str) -> float | None:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """Набор корзин по эндпоинтам WB с учётом заголовков X-Ratelimit-* и Retry-After."""
+
+    def __init__(self, endpoint_quotas: dict | None = None, host_quotas: dict | None = None):
+        if endpoint_quotas is None:
+            endpoint_quotas = scale_quotas(ENDPOINT_QUOTAS, WB_QUOTA_SCALE)
+        if host_quotas is None:
+            host_quotas = scale_quotas(HOST_QUOTAS, WB_QUOTA_SCALE)
+        self.endpoint_quotas = endpoint_quotas
+        self.host_quotas = host_quotas
+        self._buckets: dict[tuple, TokenBucket] = {}
+
+    def bucket(self, host: str, path: str) -> TokenBucket:
+        key = (host, path) if (host, path) in self.endpoint_quotas else (host, None)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            quota = self.endpoint_quotas.get(key) or self.host_quotas.get(host, DEFAULT_QUOTA)
+            bucket = TokenBucket(quota)
+            self._buckets[key] = bucket
+        return bucket
+
+    async def acquire(self, host: str, path: str):
+        await self.bucket(host, path).acquire()
+
+    def observe(self, host: str, path: str, response) -> float:
+        """Учесть заголовки ответа. Возвращает паузу (сек), если сервер её запросил."""
+        bucket = self.bucket(host, path)
+        headers = response.headers
+
+        remaining = _header_float(headers, "X-Ratelimit-Remaining")
+        if remaining is not None:
+            bucket.sync_remaining(int(remaining))
+
+        retry = _header_float(headers, "Retry-After")
+        if retry is None:
+            retry = _header_float(headers, "X-Ratelimit-Retry")
+        if retry is None and response.status_code == 429:
+            retry = _header_float(headers, "X-Ratelimit-Reset")
+        if retry is None and response.status_code == 429:
+            retry = bucket.quota.period / bucket.quota.requests
+
+        if retry:
+            bucket.pause(retry)
+            return retry
+        return 0.0
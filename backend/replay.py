@@ -0,0 +1,93 @@
+import argparse
+import time
+
+from backend.ad_stats import AD_STATS_KEY, load_ad_metrics_by_day
+from backend.archive import WB_ARCHIVE_DIR, iter_records
+from backend.card_store import init_store, load_cards_info, upsert_cards
+from backend.logs import get_logger, stage
+from backend.rollups import refresh_rollups
+from backend.storage import enrich_sales_rows, load_card_details, normalize_sales, open_store, upsert_sales
+from backend.wb_api import parse_fullstats
+
+# === Пересборка истории из архива ответов ===
+# Без сети: карточки, реклама и nm-report читаются из backend.archive и проходят
+# те же normalize / enrich / upsert, что и живая загрузка. Записи идут в порядке
+# загрузки, поэтому при повторных ответах за один день побеждает последний.
+
+# Сколько строк sales копить перед записью
+REPLAY_CHUNK_ROWS = 50000
+
+CARDS_PATH = "/content/v2/get/cards/list"
+FULLSTATS_PATH = "/adv/v2/fullstats"
+HISTORY_PATH = "/api/v2/nm-report/detail/history"
+
+log = get_logger("replay")
+
+
+def replay_cards(store, root: str, since: str | None, until: str | None) -> int:
+    count = 0
+    for record in iter_records(root, CARDS_PATH, since, until):
+        cards = (record["response"] or {}).get("cards", [])
+        upsert_cards(store, cards)
+        count += len(cards)
+    return count
+
+
+def replay_ad_stats(store, root: str, since: str | None, until: str | None) -> int:
+    written = 0
+    for record in iter_records(root, FULLSTATS_PATH, since, until):
+        written += store.bulk_upsert("ad_stats", parse_fullstats(record["response"]), AD_STATS_KEY)
+    return written
+
+
+def replay_sales(store, root: str, since: str | None, until: str | None) -> tuple:
+    """nm-report из архива -> sales. Агрегаты пересчитываются один раз в конце."""
+    cards_info = load_cards_info(store)
+    card_details = load_card_details(store)
+    touched = set()
+    written = 0
+    pending = []
+
+    def flush():
+        nonlocal written
+        # Один день артикула мог прийти в нескольких ответах — оставляем последний
+        rows = list({(row["nm_ID"], row["date"]): row for row in pending}.values())
+        dates = sorted({row["date"] for row in rows})
+        rows = enrich_sales_rows(rows, load_ad_metrics_by_day(store, dates), card_details)
+        written += upsert_sales(store, rows, rollups=False)
+        touched.update(dates)
+        log.debug(f"💾 Записано строк: {written}")
+
+    for record in iter_records(root, HISTORY_PATH, since, until):
+        pending.extend(normalize_sales((record["response"] or {}).get("data", []), cards_info))
+        if len(pending) >= REPLAY_CHUNK_ROWS:
+            flush()
+            pending = []
+    if pending:
+        flush()
+    refresh_rollups(store, touched)
+    return written, len(touched)
+
+
+def main(root: str, since: str | None, until: str | None, with_cards: bool = True):
+    started = time.perf_counter()
+    store = open_store()
+    init_store(store)
+    with stage(log, "replay", since=since or "-", until=until or "-") as counters:
+        if with_cards:
+            counters.add(cards=replay_cards(store, root, since, until))
+        counters.add(ad_stats=replay_ad_stats(store, root, since, until))
+        rows, days = replay_sales(store, root, since, until)
+        counters.add(written=rows, days=days)
+    store.close()
+    log.info(f"🎯 Пересборка завершена: {rows} строк sales за {days} дн., {time.perf_counter() - started:.1f} с")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пересборка sales из архива ответов WB без запросов к API")
+    parser.add_argument("--archive", default=WB_ARCHIVE_DIR, help="каталог архива")
+    parser.add_argument("--since", help="первый день загрузки в архиве (YYYY-MM-DD)")
+    parser.add_argument("--until", help="последний день загрузки в архиве (YYYY-MM-DD)")
+    parser.add_argument("--skip-cards", action="store_true", help="не обновлять cards из архива")
+    args = parser.parse_args()
+    main(args.archive, args.since, args.until, with_cards=not args.skip_cards)
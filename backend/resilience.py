@@ -0,0 +1,135 @@
+import os
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+import httpx
+
+from backend.logs import get_logger
+
+# === Настройки повторов и автоматов (можно переопределить через окружение) ===
+# WB_RATE_LIMIT_RETRIES — прежнее имя, пока оно задано, используется как значение по умолчанию
+WB_RETRIES = int(os.getenv("WB_RETRIES", os.getenv("WB_RATE_LIMIT_RETRIES", "3")))
+WB_BACKOFF_BASE = float(os.getenv("WB_BACKOFF_BASE", "1"))
+WB_BACKOFF_MAX = float(os.getenv("WB_BACKOFF_MAX", "30"))
+WB_BREAKER_THRESHOLD = int(os.getenv("WB_BREAKER_THRESHOLD", "5"))
+WB_BREAKER_RESET = float(os.getenv("WB_BREAKER_RESET", "60"))
+
+# Ответы, после которых запрос имеет смысл повторить
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Сетевые сбои: таймауты, обрывы соединения, ошибки протокола
+RETRY_EXCEPTIONS = (httpx.TransportError,)
+
+log = get_logger("resilience")
+
+
+class CircuitOpenError(Exception):
+    """Хост считается недоступным: запрос не отправлялся."""
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    retries: int = WB_RETRIES
+    base_delay: float = WB_BACKOFF_BASE
+    max_delay: float = WB_BACKOFF_MAX
+
+    def backoff(self, attempt: int) -> float:
+        """Экспоненциальная пауза с полным джиттером: повторы разных запросов не совпадают."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Автомат на хост: после threshold сбоев подряд запросы к нему сразу отклоняются.
+
+    Через reset_timeout пропускается один пробный запрос: успех закрывает автомат,
+    сбой снова открывает его. Сбой — 5xx или сетевая ошибка; любой другой ответ
+    (в том числе 4xx и 429) означает, что хост жив. Пробный запрос, завершившийся
+    иначе (отмена, исключение), освобождается через release().
+    """
+
+    def __init__(self, threshold: int = WB_BREAKER_THRESHOLD, reset_timeout: float = WB_BREAKER_RESET,
+                 clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self._clock = clock
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self._clock() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def check(self, host: str) -> bool:
+        """Пропускает запрос или бросает CircuitOpenError. True — это пробный запрос."""
+        state = self.state
+        if state == "open" or (state == "half-open" and self.trial):
+            raise CircuitOpenError(f"{host}: автомат разомкнут после {self.failures} сбоев подряд")
+        self.trial = state == "half-open"
+        return self.trial
+
+    def release(self):
+        """Пробный запрос закончился без вердикта — следующий снова может стать пробным."""
+        self.trial = False
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def failure(self) -> bool:
+        """Учитывает сбой. True — автомат только что разомкнулся."""
+        self.failures += 1
+        reopened = self.trial
+        self.trial = False
+        if reopened or (self.opened_at is None and self.failures >= self.threshold):
+            self.opened_at = self._clock()
+            return True
+        return False
+
+
+class RunErrors:
+    """Учёт ошибок WB API за прогон: запросы, повторы и причины сбоев по хостам."""
+
+    def __init__(self):
+        self.requests = Counter()
+        self.retries = Counter()
+        self.failed = Counter()
+        self.rejected = Counter()
+        self.trips = Counter()
+        self.reasons = Counter()
+
+    def reason(self, host: str, reason):
+        self.reasons[(host, str(reason))] += 1
+
+    def summary(self) -> dict:
+        hosts = sorted(set(self.requests) | set(self.rejected))
+        return {
+            host: {
+                "requests": self.requests[host],
+                "retries": self.retries[host],
+                "failed": self.failed[host],
+                "rejected": self.rejected[host],
+                "breaker_trips": self.trips[host],
+                "reasons": {reason: count for (h, reason), count in sorted(self.reasons.items()) if h == host},
+            }
+            for host in hosts
+        }
+
+    def report(self):
+        if not self.reasons and not self.rejected:
+            return
+        for host, stats in self.summary().items():
+            if not stats["reasons"] and not stats["rejected"]:
+                continue
+            reasons = ", ".join(f"{reason}×{count}" for reason, count in stats["reasons"].items())
+            log.warning(
+                f"📉 {host}: запросов {stats['requests']}, повторов {stats['retries']}, "
+                f"неудач {stats['failed']}, отклонено автоматом {stats['rejected']} ({reasons})",
+                extra={"fields": {"stage": "wb_api_errors", "host": host, **stats}},
+            )
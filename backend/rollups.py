@@ -0,0 +1,99 @@
+from backend.profit import COST_FIELDS, DEFECT_PERCENT, cost_price_sql, total_profit_sql
+
+# === Дневные агрегаты продаж ===
+# Эндпоинты дашборда читают не сырые строки sales (nmID × день), а готовые суммы:
+# sales_daily_imt — одна строка на связку в день, sales_daily_vendor — на артикул в день.
+# Агрегаты пересчитываются по затронутым ключам (день, связка): запись батча
+# из 20 артикулов не должна перечитывать весь каталог за эти дни.
+
+COST_PRICE_SQL = cost_price_sql()
+PROFIT_SQL = total_profit_sql()
+
+# Ключ связки в агрегатах; по этому же выражению построен индекс ix_sales_date_imt
+IMT_KEY_SQL = "COALESCE(imtID, 0)"
+
+_SUMS = {
+    "ordersCount": ("INTEGER", "SUM(COALESCE(ordersCount, 0))"),
+    "ad_spend": ("REAL", "SUM(COALESCE(ad_spend, 0))"),
+    "revenue": ("REAL", "SUM(COALESCE(salePrice, 0) * COALESCE(ordersCount, 0))"),
+    "profit": ("REAL", f"SUM({PROFIT_SQL})"),
+}
+
+# {таблица: (ключ, {колонка: (тип, выражение над sales)})}
+ROLLUPS = {
+    "sales_daily_imt": (
+        ("date", "imtID"),
+        {
+            "date": ("TEXT", "date"),
+            "imtID": ("INTEGER", IMT_KEY_SQL),
+            **_SUMS,
+        },
+    ),
+    # Средние по артикулу считаются как сумма / row_count за период
+    "sales_daily_vendor": (
+        ("date", "imtID", "vendorCode"),
+        {
+            "date": ("TEXT", "date"),
+            "imtID": ("INTEGER", IMT_KEY_SQL),
+            "vendorCode": ("TEXT", "COALESCE(vendorCode, '')"),
+            "row_count": ("INTEGER", "COUNT(*)"),
+            **_SUMS,
+            "salePrice_sum": ("REAL", "SUM(COALESCE(salePrice, 0))"),
+            "cost_price_sum": ("REAL", f"SUM({COST_PRICE_SQL})"),
+            # себестоимость заказов — чтобы подменить её версией из cost_versions
+            "cost_orders_sum": ("REAL", f"SUM({COST_PRICE_SQL} * COALESCE(ordersCount, 0))"),
+            # пустой процент брака — как в формуле себестоимости
+            **{
+                f"{field}_sum": ("REAL", f"SUM(COALESCE({field}, {DEFECT_PERCENT if field == 'defect_percent' else 0}))")
+                for field in COST_FIELDS
+            },
+        },
+    ),
+}
+
+# Сколько дат (и связок) пересчитывать одним запросом
+REFRESH_CHUNK_SIZE = 200
+
+
+def rollup_insert_sql(table: str, where: str = "") -> str:
+    """INSERT ... SELECT ... GROUP BY, пересчитывающий агрегат из sales."""
+    key, columns = ROLLUPS[table]
+    select = ", ".join(expression for _, expression in columns.values())
+    group_by = ", ".join(columns[column][1] for column in key)
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"SELECT {select} FROM sales {where} GROUP BY {group_by}"
+    )
+
+
+def _chunks(values: list) -> list:
+    return [values[i:i + REFRESH_CHUNK_SIZE] for i in range(0, len(values), REFRESH_CHUNK_SIZE)] or [None]
+
+
+def refresh_rollups(store, dates, imt_ids=None) -> int:
+    """Пересобирает агрегаты за указанные дни одной транзакцией.
+
+    imt_ids — только эти связки (None у строки sales = 0); без них — весь каталог
+    за эти дни (массовая перезаливка, replay).
+    """
+    dates = sorted({str(day)[:10] for day in dates})
+    imts = None if imt_ids is None else sorted({imt_id or 0 for imt_id in imt_ids})
+    if not dates or imts == []:
+        return 0
+    for date_chunk in _chunks(dates):
+        for imt_chunk in _chunks(imts or []):
+            where = f"WHERE date IN ({', '.join('?' * len(date_chunk))})"
+            params = tuple(date_chunk)
+            # В агрегатах imtID уже приведён к ключу, в sales — через то же выражение
+            rollup_where, sales_where = where, where
+            if imt_chunk is not None:
+                imt_in = f"IN ({', '.join('?' * len(imt_chunk))})"
+                rollup_where += f" AND imtID {imt_in}"
+                sales_where += f" AND {IMT_KEY_SQL} {imt_in}"
+                params += tuple(imt_chunk)
+            for table in ROLLUPS:
+                store.execute(f"DELETE FROM {table} {rollup_where}", params)
+                store.execute(rollup_insert_sql(table, sales_where), params)
+    store.commit()
+    return len(dates)
+
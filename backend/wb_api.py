@@ -0,0 +1,360 @@
+import os
+import asyncio
+from collections import defaultdict
+
+import httpx
+
+from backend.logs import get_logger
+from backend.resilience import CircuitOpenError
+from backend.wb_client import WBClient, get_client
+
+# Сколько батчей nm-report держать в полёте одновременно (темп всё равно задаёт RateLimiter)
+WB_SALES_CONCURRENCY = int(os.getenv("WB_SALES_CONCURRENCY", "3"))
+SALES_BATCH_SIZE = 20
+
+log = get_logger("wb_api")
+
+
+def safe_int(val):
+    return int(val) if isinstance(val, (int, float)) else 0
+
+
+# === 1. Карточки (Content API) ===
+async def fetch_cards_raw(client: WBClient | None = None, since: str | None = None) -> list:
+    """Обход cards/list по курсору. С since — только карточки с updatedAt >= since.
+
+    Каталог отдаётся по убыванию updatedAt, поэтому дельта-режим останавливается
+    на первой странице, где встретилась карточка старше курсора.
+    """
+    client = client or get_client()
+    limit = 100
+    cursor = {}
+    all_cards = []
+
+    while True:
+        payload = {
+            "settings": {
+                "sort": {"ascending": False},
+                "cursor": {"limit": limit},
+                "filter": {"withPhoto": -1}
+            }
+        }
+        if cursor:
+            payload["settings"]["cursor"].update(cursor)
+
+        response = await client.post("content", "/content/v2/get/cards/list", json=payload)
+        response.raise_for_status()
+        raw_data = response.json()
+
+        cards = raw_data.get("cards", [])
+        cursor_data = raw_data.get("cursor", {})
+        total = cursor_data.get("total", 0)
+
+        if since is not None:
+            fresh = [card for card in cards if (card.get("updatedAt") or "") >= since]
+            all_cards.extend(fresh)
+            if len(fresh) < len(cards):
+                break
+        else:
+            all_cards.extend(cards)
+
+        if total < limit:
+            break
+
+        cursor = {
+            "updatedAt": cursor_data.get("updatedAt"),
+            "nmID": cursor_data.get("nmID")
+        }
+
+    return all_cards
+
+
+async def fetch_all_cards(client: WBClient | None = None) -> dict:
+    all_cards = {}
+    for card in await fetch_cards_raw(client):
+        nmID = card.get("nmID")
+        if nmID:
+            all_cards[nmID] = {
+                "imtID": card.get("imtID"),
+                "vendorCode": card.get("vendorCode"),
+                "brand": card.get("brand"),
+                "subjectName": card.get("subjectName")
+            }
+
+    log.info(f"✅ Получено карточек: {len(all_cards)}")
+    return all_cards
+
+
+# === 2. Метрики продаж (nm-report) ===
+async def fetch_sales_batch(nmIDs: list, begin: str, end: str | None = None,
+                            client: WBClient | None = None) -> list:
+    """Один запрос nm-report/detail/history. В отличие от get_sales_data, ошибки пробрасываются."""
+    client = client or get_client()
+    payload = {
+        "nmIDs": nmIDs,
+        "period": {
+            "begin": begin,
+            "end": end or begin
+        },
+        "timezone": "Europe/Moscow",
+        "aggregationLevel": "day"
+    }
+
+    response = await client.post("analytics", "/api/v2/nm-report/detail/history", json=payload)
+    response.raise_for_status()
+    return response.json().get("data", [])
+
+
+async def get_sales_data(nmIDs: list, begin: str, end: str | None = None,
+                         client: WBClient | None = None) -> list:
+    """Как fetch_sales_batch, но ошибка WB API (после всех повторов) даёт пустой список."""
+    try:
+        return await fetch_sales_batch(nmIDs, begin, end, client)
+    except (httpx.HTTPError, CircuitOpenError) as err:
+        log.error(f"❌ Ошибка запроса: {err}")
+        return []
+
+
+async def iter_sales_batches(batches: list, begin: str, end: str | None = None,
+                             failed: list | None = None, concurrency: int | None = None,
+                             client: WBClient | None = None):
+    """Параллельно запрашивает nm-report по готовым батчам и отдаёт (batch, data) по мере готовности.
+
+    Упавшие батчи не теряются: в failed добавляется пара (batch, error).
+    """
+    client = client or get_client()
+    semaphore = asyncio.Semaphore(concurrency or WB_SALES_CONCURRENCY)
+
+    async def fetch(batch):
+        async with semaphore:
+            try:
+                return batch, await fetch_sales_batch(batch, begin, end, client), None
+            except Exception as err:
+                return batch, None, err
+
+    tasks = [asyncio.create_task(fetch(batch)) for batch in batches]
+    try:
+        for done, future in enumerate(asyncio.as_completed(tasks), start=1):
+            batch, data, err = await future
+            if err is not None:
+                log.error(f"❌ Батч {done} из {len(batches)} не загружен: {err}")
+                if failed is not None:
+                    failed.append((batch, err))
+                continue
+            log.debug(f"⏳ Получен батч {done} из {len(batches)}")
+            yield batch, data
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def report_failed_batches(failed: list):
+    if not failed:
+        return
+    nm_ids = [nm_id for batch, _ in failed for nm_id in batch]
+    log.warning(
+        f"⚠️ Не загружено батчей: {len(failed)} ({len(nm_ids)} артикулов)",
+        extra={"fields": {"failed_batches": len(failed), "failed_nm_ids": nm_ids}},
+    )
+    log.debug(f"Артикулы упавших батчей: {nm_ids}")
+
+
+# === 3. Рекламные метрики ===
+# fullstats принимает ограниченное число кампаний в одном запросе
+FULLSTATS_CHUNK_SIZE = 100
+# Поля статистики по артикулу в fullstats -> колонки таблицы ad_stats
+AD_STAT_FIELDS = {
+    "views": "views", "clicks": "clicks", "sum": "spend", "atbs": "atbs",
+    "orders": "orders", "shks": "shks", "sum_price": "sum_price",
+}
+
+
+# Статусы promotion/count: 9 — идут показы, 11 — на паузе (могла крутиться в эти дни).
+# Завершённые (7), отменённые (8) и прочие попадают в запрос, только если менялись
+# не раньше начала периода — иначе статистики за период у них нет.
+ACTIVE_CAMPAIGN_STATUSES = (9, 11)
+
+
+async def fetch_campaigns(client: WBClient | None = None) -> list:
+    """Список кампаний из promotion/count: [{advertId, type, status, changeTime}]."""
+    client = client or get_client()
+    r = await client.get("advert", "/adv/v1/promotion/count")
+    r.raise_for_status()
+    return [
+        {
+            "advertId": advert.get("advertId"),
+            "type": group.get("type"),
+            "status": group.get("status"),
+            "changeTime": advert.get("changeTime"),
+        }
+        for group in r.json().get("adverts", [])
+        for advert in group.get("advert_list", [])
+        if advert.get("advertId")
+    ]
+
+
+def campaigns_active_during(campaigns: list, dates: list) -> list:
+    """advertId кампаний, которые могли крутиться в указанные даты."""
+    if not dates:
+        return []
+    first = min(str(day)[:10] for day in dates)
+    return [
+        campaign["advertId"]
+        for campaign in campaigns
+        if campaign["status"] in ACTIVE_CAMPAIGN_STATUSES or (campaign["changeTime"] or "")[:10] >= first
+    ]
+
+
+async def fetch_fullstats_chunk(campaign_ids: list, dates: list, client: WBClient | None = None) -> list:
+    """Один запрос fullstats -> плоские строки (date, advertId, appType, nmId, метрики)."""
+    client = client or get_client()
+    body = [{"id": cid, "dates": list(dates)} for cid in campaign_ids]
+    response = await client.post("advert", "/adv/v2/fullstats", json=body)
+    response.raise_for_status()
+    return parse_fullstats(response.json())
+
+
+def parse_fullstats(data) -> list:
+    """Ответ fullstats -> плоские строки ad_stats (используется и при повторе из архива)."""
+    rows = []
+    for campaign in data or []:
+        for day in campaign.get("days", []):
+            for app in day.get("apps", []):
+                for item in app.get("nm", []):
+                    row = {
+                        "date": (day.get("date") or "")[:10],
+                        "advertId": campaign.get("advertId"),
+                        "appType": app.get("appType") or 0,
+                        "nmId": item.get("nmId"),
+                    }
+                    for field, column in AD_STAT_FIELDS.items():
+                        value = item.get(field)
+                        row[column] = value if isinstance(value, (int, float)) else 0
+                    rows.append(row)
+    return rows
+
+
+async def fetch_ad_stats(dates: list, campaign_ids: list | None = None, failed: list | None = None,
+                         client: WBClient | None = None) -> list:
+    """Статистика кампаний за даты: запросы по FULLSTATS_CHUNK_SIZE кампаний.
+
+    Без campaign_ids берутся кампании, активные в эти даты (campaigns_active_during).
+
+    Чанки уходят одновременно, темп задаёт лимитер advert-api. Упавший чанк
+    попадает в failed как (кампании, ошибка) и не отменяет остальные.
+    """
+    client = client or get_client()
+    if campaign_ids is None:
+        campaign_ids = campaigns_active_during(await fetch_campaigns(client), dates)
+    chunks = [campaign_ids[i:i + FULLSTATS_CHUNK_SIZE] for i in range(0, len(campaign_ids), FULLSTATS_CHUNK_SIZE)]
+
+    async def fetch(chunk):
+        try:
+            return await fetch_fullstats_chunk(chunk, dates, client)
+        except Exception as err:
+            log.error(f"❌ Чанк fullstats ({len(chunk)} кампаний) не загружен: {err}")
+            if failed is not None:
+                failed.append((chunk, err))
+            return []
+
+    results = await asyncio.gather(*(fetch(chunk) for chunk in chunks))
+    return [row for rows in results for row in rows]
+
+
+def ad_metrics(views, clicks, spend, atbs, orders, shks, sum_price) -> dict:
+    """Колонки ad_* строки sales по суммам статистики артикула за день."""
+    return {
+        "ad_views": views, "ad_clicks": clicks, "ad_spend": spend, "ad_atbs": atbs,
+        "ad_orders": orders, "ad_shks": shks, "ad_sum_price": sum_price,
+        "ad_ctr": round((clicks / views) * 100, 2) if views else 0,
+        "ad_cpc": round(spend / clicks, 2) if clicks else 0,
+        "ad_cr": round((orders / clicks) * 100, 2) if clicks else 0,
+    }
+
+
+def aggregate_ad_stats(rows: list) -> dict:
+    """Строки ad_stats -> {дата: {nmID: ad_*}}: суммы по кампаниям и платформам."""
+    totals = defaultdict(lambda: defaultdict(lambda: [0] * len(AD_STAT_FIELDS)))
+    for row in rows:
+        sums = totals[row["date"]][row["nmId"]]
+        for i, column in enumerate(AD_STAT_FIELDS.values()):
+            sums[i] += row[column] or 0
+    return {
+        day: {nm_id: ad_metrics(*sums) for nm_id, sums in by_nm.items()}
+        for day, by_nm in totals.items()
+    }
+
+
+async def get_ad_metrics_by_day(dates: list, client: WBClient | None = None) -> dict:
+    """Рекламная статистика за несколько дат без сохранения: {дата: {nmID: метрики}}."""
+    try:
+        rows = await fetch_ad_stats(dates, client=client)
+    except Exception as err:
+        log.error(f"❌ Не удалось получить кампании: {err}")
+        return {}
+    return aggregate_ad_stats(rows)
+
+
+async def get_ad_metrics(date: str, client: WBClient | None = None) -> dict:
+    return (await get_ad_metrics_by_day([date], client)).get(date, {})
+
+
+# === 4. Цены (Discounts & Prices API) ===
+async def fetch_price_page(offset: int, limit: int = 1000, client: WBClient | None = None) -> list:
+    client = client or get_client()
+    response = await client.get(
+        "prices", "/api/v2/list/goods/filter", params={"limit": limit, "offset": offset}
+    )
+    response.raise_for_status()
+    return response.json().get("data", {}).get("listGoods", [])
+
+
+async def get_all_discounted_prices(client: WBClient | None = None) -> dict:
+    """Цены со скидкой {nmID: discountedPrice} по всем страницам.
+
+    Страница, не загрузившаяся после повторов, прерывает обход с ошибкой:
+    неполный прайс молча превратился бы в пропущенные карточки.
+    """
+    limit = 1000
+    offset = 0
+    result = {}
+
+    while True:
+        try:
+            goods = await fetch_price_page(offset, limit, client)
+        except Exception as e:
+            log.error(f"❌ Ошибка при получении товаров (offset={offset}): {e}")
+            raise
+
+        if not goods:
+            break
+
+        for item in goods:
+            sizes = item.get("sizes", [])
+            if sizes and isinstance(sizes, list):
+                result[item.get("nmID")] = sizes[0].get("discountedPrice", 0)
+
+        offset += limit
+
+    log.info(f"✅ Получено цен: {len(result)}")
+    return result
+
+
+# === 5. Комиссии по категориям ===
+async def fetch_commissions(client: WBClient | None = None) -> dict:
+    client = client or get_client()
+    response = await client.get("common", "/api/v1/tariffs/commission", params={"locale": "ru"})
+    response.raise_for_status()
+    raw_data = response.json()
+
+    if not isinstance(raw_data, dict):
+        raise Exception(f"❌ Ожидался dict, но пришло: {type(raw_data)}")
+
+    data = raw_data.get("report", [])
+    if not isinstance(data, list):
+        raise Exception(f"❌ Ожидался список, но пришло: {type(data)}")
+
+    return {
+        item["subjectName"]: item["kgvpSupplier"]
+        for item in data if "subjectName" in item and "kgvpSupplier" in item
+    }
@@ -0,0 +1,222 @@
+import os
+import asyncio
+import weakref
+
+import httpx
+from dotenv import load_dotenv
+
+from backend.archive import WB_ARCHIVE, ResponseArchive
+from backend.logs import get_logger
+from backend.rate_limit import RateLimiter
+from backend.resilience import (
+    RETRY_EXCEPTIONS, RETRY_STATUSES, CircuitBreaker, CircuitOpenError, RetryPolicy, RunErrors,
+)
+
+# 🔐 Токен берём из backend/api.env независимо от текущей директории
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "api.env"))
+WB_API_KEY = os.getenv("WB_API_KEY")
+
+# === Хосты WB API ===
+WB_HOSTS = {
+    "content": "https://content-api.wildberries.ru",
+    "analytics": "https://seller-analytics-api.wildberries.ru",
+    "advert": "https://advert-api.wildberries.ru",
+    "prices": "https://discounts-prices-api.wildberries.ru",
+    "common": "https://common-api.wildberries.ru",
+}
+# Один адрес вместо всех хостов — например, локальный mock-сервер (backend.mock_wb)
+WB_BASE_URL = os.getenv("WB_BASE_URL")
+
+# === Настройки соединений (можно переопределить через окружение) ===
+WB_TIMEOUT = float(os.getenv("WB_TIMEOUT", "30"))
+WB_CONNECT_TIMEOUT = float(os.getenv("WB_CONNECT_TIMEOUT", "10"))
+WB_MAX_CONNECTIONS = int(os.getenv("WB_MAX_CONNECTIONS", "10"))
+WB_KEEPALIVE_EXPIRY = float(os.getenv("WB_KEEPALIVE_EXPIRY", "60"))
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+WB_HTTP2 = os.getenv("WB_HTTP2", "1") == "1" and _http2_available()
+
+log = get_logger("wb_client")
+
+
+class WBClient:
+    """Пул keep-alive соединений к WB API: по одному httpx.AsyncClient на хост.
+
+    Каждый запрос проходит через RateLimiter, поэтому вызывающему коду
+    не нужны ручные паузы между запросами. 429, 5xx и сетевые сбои повторяются
+    с backoff, автомат хоста отсекает запросы к деградировавшему API, а ошибки
+    копятся в self.errors до конца прогона. Успешные ответы дописываются
+    в архив (backend.archive), если он включён.
+    """
+
+    def __init__(self, token: str | None = None, timeout: float | None = None,
+                 connect_timeout: float | None = None, max_connections: int | None = None,
+                 http2: bool | None = None, limiter: RateLimiter | None = None,
+                 policy: RetryPolicy | None = None, archive: ResponseArchive | None = None,
+                 base_url: str | None = None, transport: httpx.AsyncBaseTransport | None = None):
+        self.token = token or WB_API_KEY
+        self.limiter = limiter or RateLimiter()
+        self.policy = policy or RetryPolicy()
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self.errors = RunErrors()
+        self.archive = archive if archive is not None else (ResponseArchive() if WB_ARCHIVE else None)
+        self.timeout = httpx.Timeout(
+            timeout if timeout is not None else WB_TIMEOUT,
+            connect=connect_timeout if connect_timeout is not None else WB_CONNECT_TIMEOUT,
+        )
+        self.limits = httpx.Limits(
+            max_connections=max_connections or WB_MAX_CONNECTIONS,
+            max_keepalive_connections=max_connections or WB_MAX_CONNECTIONS,
+            keepalive_expiry=WB_KEEPALIVE_EXPIRY,
+        )
+        self.http2 = WB_HTTP2 if http2 is None else http2
+        self.base_url = base_url or WB_BASE_URL
+        self.transport = transport
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    def _client(self, host: str) -> httpx.AsyncClient:
+        client = self._clients.get(host)
+        if client is None:
+            client = httpx.AsyncClient(
+                base_url=self.base_url or WB_HOSTS[host],
+                headers={"Authorization": self.token or ""},
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+                transport=self.transport,
+            )
+            self._clients[host] = client
+        return client
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        breaker = self.breakers.get(host)
+        if breaker is None:
+            breaker = self.breakers[host] = CircuitBreaker()
+        return breaker
+
+    def _failure(self, host: str):
+        if self.breaker(host).failure():
+            self.errors.trips[host] += 1
+            log.error(f"🔌 {host}: автомат разомкнут, запросы к хосту приостановлены")
+
+    async def request(self, host: str, method: str, path: str, **kwargs) -> httpx.Response:
+        """Запрос с повторами. Последний неудачный ответ возвращается как есть
+        (вызывающий делает raise_for_status), сетевая ошибка — пробрасывается.
+        """
+        breaker = self.breaker(host)
+        for attempt in range(self.policy.retries + 1):
+            try:
+                trial = breaker.check(host)
+            except CircuitOpenError:
+                self.errors.rejected[host] += 1
+                raise
+            try:
+                await self.limiter.acquire(host, path)
+                self.errors.requests[host] += 1
+                last = attempt == self.policy.retries
+                try:
+                    response = await self._client(host).request(method, path, **kwargs)
+                except RETRY_EXCEPTIONS as err:
+                    self.errors.reason(host, type(err).__name__)
+                    self._failure(host)
+                    if last:
+                        self.errors.failed[host] += 1
+                        raise
+                    delay = self.policy.backoff(attempt)
+                    log.warning(f"⚠️ {type(err).__name__} от {host} {path}, повтор через {delay:.1f} с")
+                else:
+                    # Retry-After / X-Ratelimit-Retry ставят корзину хоста на паузу сами
+                    pause = self.limiter.observe(host, path, response)
+                    status = response.status_code
+                    # Автомату важно только одно: ответил ли хост без 5xx
+                    if status >= 500:
+                        self._failure(host)
+                    else:
+                        breaker.success()
+                    if status not in RETRY_STATUSES:
+                        if status < 400:
+                            if self.archive is not None:
+                                self.archive.append(host, method, path, kwargs.get("params"),
+                                                    kwargs.get("json"), response)
+                        else:
+                            self.errors.reason(host, status)
+                            self.errors.failed[host] += 1
+                        return response
+                    self.errors.reason(host, status)
+                    if last:
+                        self.errors.failed[host] += 1
+                        return response
+                    delay = 0.0 if pause else self.policy.backoff(attempt)
+                    log.warning(f"⏳ {status} от {host} {path}, повтор через {max(pause, delay):.1f} с")
+            finally:
+                # Отмена или чужое исключение не должны навсегда занять пробный запрос
+                if trial:
+                    breaker.release()
+            self.errors.retries[host] += 1
+            await asyncio.sleep(delay)
+        return response
+
+    async def get(self, host: str, path: str, **kwargs) -> httpx.Response:
+        return await self.request(host, "GET", path, **kwargs)
+
+    async def post(self, host: str, path: str, **kwargs) -> httpx.Response:
+        return await self.request(host, "POST", path, **kwargs)
+
+    async def aclose(self):
+        if self.archive is not None:
+            self.archive.close()
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.errors.report()
+        await self.aclose()
+
+
+# === Общий клиент на event loop ===
+# httpx.AsyncClient привязан к циклу, в котором открыт, поэтому кэшируем по циклу
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, WBClient]" = weakref.WeakKeyDictionary()
+
+
+def get_client() -> WBClient:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = WBClient()
+        _clients[loop] = client
+    return client
+
+
+def set_client(client: WBClient):
+    """Подменить общий клиент текущего цикла (mock-сервер, бенчмарки)."""
+    _clients[asyncio.get_running_loop()] = client
+
+
+async def close_client():
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        client.errors.report()
+        await client.aclose()
+
+
+def run(coro):
+    """asyncio.run, который закрывает общий клиент после завершения."""
+    async def _main():
+        try:
+            return await coro
+        finally:
+            await close_client()
+
+    return asyncio.run(_main())
@@ -1,215 +1,114 @@
-import requests
-import sqlite3
-import time
+import asyncio
 from dotenv import load_dotenv
 import os
 
+from backend.card_store import sync_cards
+from backend.logs import get_logger, stage
+from backend.profit import DEFECT_PERCENT, as_array, card_costs
+from backend.storage import open_store
+from backend.wb_api import get_all_discounted_prices, fetch_commissions
+from backend.wb_client import WBClient, run
+
 # === Конфигурация ===
 load_dotenv("api.env")
 WB_API_KEY = os.getenv("WB_API_KEY")
-TAX_PERCENT = 12  # Процент налога
-DEFECT_PERCENT = 2  # Процент брака
-SALARY_PER_ITEM = 100  # Зарплата на единицу товара
-
-# === Получение всех карточек товара через Content API ===
-def fetch_all_cards():
-    url = "https://content-api.wildberries.ru/content/v2/get/cards/list"
-    headers = {
-        "Authorization": WB_API_KEY,
-        "Content-Type": "application/json"
-    }
-
-    limit = 100
-    cursor_data = {}
-    all_cards = {}
-
-    for _ in range(100):  # максимум 100 запросов
-        payload = {
-            "settings": {
-                "cursor": {"limit": limit},
-                "filter": {"withPhoto": -1}
-            }
-        }
 
-        if cursor_data:
-            payload["settings"]["cursor"].update(cursor_data)
+log = get_logger("work_with_cards")
 
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
-        data = response.json()
 
-        cards = data.get("cards", [])
-        for card in cards:
-            nm_id = card.get("nmID")
-            if nm_id:
-                all_cards[nm_id] = {
-                    "vendorCode": card.get("vendorCode"),
-                    "nmID": nm_id
-                }
-
-        cursor_data = data.get("cursor", {})
-        if cursor_data.get("total", 0) < limit:
-            break
+# === Обновление таблицы cards в БД с расчётом прибыли ===
+CARD_COST_COLUMNS = [
+    "purchase_price", "delivery_to_warehouse", "commission_percent", "wb_logistics",
+    "packaging", "fuel", "gift", "defect_percent",
+]
 
-        time.sleep(0.7)  # ограничение по API — не более 100 запросов в минуту
 
-    print(f"✅ Получено карточек: {len(all_cards)}")
-    return all_cards
+def recompute_card_profits(store, discounted_prices: dict) -> tuple:
+    """Пересчитывает себестоимость и прибыль всего каталога одним проходом.
 
-# === Получение всех цен со скидкой через Discount Prices API ===
-def get_all_discounted_prices(api_key: str) -> dict:
-    url = "https://discounts-prices-api.wildberries.ru/api/v2/list/goods/filter"
-    headers = {
-        "Authorization": WB_API_KEY
+    Карточки читаются одним запросом, расчёт — над массивами NumPy,
+    запись — одним пакетным upsert по nmID. Возвращает (обновлено, пропущено без цены).
+    """
+    rows = store.query(f"SELECT nmID, {', '.join(CARD_COST_COLUMNS)} FROM cards")
+    priced = [row for row in rows if discounted_prices.get(row[0]) is not None]
+    if not priced:
+        return 0, len(rows)
+
+    nm_ids = [row[0] for row in priced]
+    sale_prices = as_array([discounted_prices[nm_id] for nm_id in nm_ids])
+    columns = list(zip(*(row[1:] for row in priced)))
+    components = {
+        name: as_array(values, DEFECT_PERCENT if name == "defect_percent" else 0.0)
+        for name, values in zip(CARD_COST_COLUMNS, columns)
     }
 
-    limit = 1000
-    offset = 0
-    result = {}
-
-    while True:
-        params = {
-            "limit": limit,
-            "offset": offset
+    costs = card_costs(sale_prices, components, components["commission_percent"])
+    results = zip(
+        nm_ids, sale_prices.tolist(), costs["tax_rub"].tolist(), costs["wb_commission_rub"].tolist(),
+        costs["defect_percent"].tolist(), costs["cost_price"].tolist(), costs["profit_per_item"].tolist(),
+    )
+    updated = store.bulk_upsert("cards", [
+        {
+            "nmID": nm_id,
+            "salePrice": sale_price,
+            "tax_rub": tax_rub,
+            "wb_commission_rub": wb_commission_rub,
+            "defect_percent": defect_percent,
+            "cost_price": cost_price,
+            "profit_per_item": profit,
         }
+        for nm_id, sale_price, tax_rub, wb_commission_rub, defect_percent, cost_price, profit in results
+    ], ("nmID",))
+    return updated, len(rows) - len(priced)
 
-        try:
-            response = requests.get(url, headers=headers, params=params)
-            print(response)
-            response.raise_for_status()
-            goods = response.json().get("data", {}).get("listGoods", [])
-        except Exception as e:
-            print(f"❌ Ошибка при получении товаров: {e}")
-            break
 
-        if not goods:
-            break
-
-        for item in goods:
-            nm_id = item.get("nmID")
-            sizes = item.get("sizes", [])
-            if sizes and isinstance(sizes, list):
-                discounted_price = sizes[0].get("discountedPrice", 0)
-                result[nm_id] = discounted_price
+def update_cards_with_profit():
+    store = open_store()
 
-        offset += limit
+    # Получаем карточки и цены (параллельно, через общий пул соединений)
+    async def fetch_cards_and_prices():
+        return await asyncio.gather(sync_cards(store), get_all_discounted_prices())
 
-    print(f"✅ Получено цен: {len(result)}")
-    return result
+    with stage(log, "card_profits") as counters:
+        _, discounted_prices = run(fetch_cards_and_prices())
+        updated, skipped = recompute_card_profits(store, discounted_prices)
+        store.close()
+        counters.add(written=updated, skipped=skipped)
+        if skipped:
+            log.warning(f"⚠️ Пропущено карточек без цены: {skipped}")
 
-# === Обновление таблицы cards в БД с расчётом прибыли ===
-def update_cards_with_profit():
-    conn = sqlite3.connect("wildberries_cards.db")
-    cursor = conn.cursor()
-
-    # Получаем карточки и цены
-    cards = fetch_all_cards()
-    discounted_prices = get_all_discounted_prices(WB_API_KEY)
-
-    for nm_id, info in cards.items():
-        vendor_code = info.get("vendorCode", "")
-        sale_price = discounted_prices.get(nm_id)
-
-        if sale_price is None:
-            print(f"⚠️ Пропущено (нет цены): {vendor_code}")
-            continue
-
-        print(f"{vendor_code} — цена со скидкой: {sale_price}")
-
-        # Получаем себестоимость и расходы из таблицы
-        cursor.execute("""
-            SELECT purchase_price, delivery_to_warehouse, commission_percent, wb_logistics,
-                   packaging, fuel, gift
-            FROM cards WHERE vendorCode = ?
-        """, (vendor_code,))
-        row = cursor.fetchone()
-        if not row:
-            print(f"⚠️ Пропущено (нет данных в БД): {vendor_code}")
-            continue
-
-        (purchase_price, delivery_to_warehouse, commission_percent, wb_logistics,
-         packaging, fuel, gift) = [v or 0 for v in row]
-
-        # Расчёты
-        tax_rub = sale_price * TAX_PERCENT / 100
-        commission_rub = sale_price * (commission_percent or 0) / 100
-        wb_commission_rub = sale_price * (commission_percent or 0) / 100
-
-        print("purchase_price:", purchase_price)
-        print("delivery_to_warehouse:", delivery_to_warehouse)
-        print("commission_rub:", commission_rub)
-        print("wb_logistics:", wb_logistics)
-        print("tax_rub:", tax_rub)
-        print("packaging:", packaging)
-        print("fuel:", fuel)
-        print("gift:", gift)
-        print("SALARY_PER_ITEM:", SALARY_PER_ITEM)
-        print("DEFECT_PERCENT:", DEFECT_PERCENT)
-
-        cost_price = (
-            purchase_price + delivery_to_warehouse + commission_rub + wb_logistics +
-            tax_rub + packaging + fuel + gift + SALARY_PER_ITEM
-        ) * (1 + DEFECT_PERCENT / 100)
-        profit = sale_price - cost_price
-        print(sale_price)
-        print(cost_price)
-        print(profit)
-
-
-        # Обновляем таблицу
-        cursor.execute("""
-            UPDATE cards
-            SET salePrice = ?, tax_rub = ?, wb_commission_rub = ?, cost_price = ?, profit_per_item = ?
-            WHERE vendorCode = ?
-        """, (sale_price, tax_rub, wb_commission_rub, cost_price, profit, vendor_code))
-
-    conn.commit()
-    conn.close()
-    print("🎯 Таблица cards обновлена!")
-
-def get_commission_rates_and_update_cards(WB_API_KEY: str, db_path: str = "wildberries_cards.db"):
-    url = "https://common-api.wildberries.ru/api/v1/tariffs/commission"
-    headers = {
-        "Authorization": WB_API_KEY
-    }
-    params = {
-        "locale": "ru"
-    }
+def get_commission_rates_and_update_cards(WB_API_KEY: str, db_url: str | None = None):
+    async def fetch():
+        async with WBClient(token=WB_API_KEY) as client:
+            return await fetch_commissions(client)
 
     try:
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        data = response.json()
+        commissions = asyncio.run(fetch())
     except Exception as e:
-        print(f"❌ Ошибка при получении комиссии: {e}")
+        log.error(f"❌ Ошибка при получении комиссии: {e}")
         return
 
-    # Открываем соединение с БД
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    updated = 0
-    for entry in data.get("report", []):
-        subject_name = entry.get("subjectName")
-        kgvp_supplier = entry.get("kgvpSupplier")
-        print("Комиссия для товара", subject_name, kgvp_supplier)
-
-        if subject_name and kgvp_supplier is not None:
-            cursor.execute("""
-                UPDATE cards
-                SET commission_percent = ?
-                WHERE subjectName = ?
-            """, (kgvp_supplier, subject_name))
-            updated += cursor.rowcount
+    # Открываем хранилище (DB_URL по умолчанию)
+    store = open_store(db_url)
 
-    conn.commit()
-    conn.close()
+    with stage(log, "commissions") as counters:
+        for subject_name, kgvp_supplier in commissions.items():
+            log.debug(f"Комиссия для товара {subject_name}: {kgvp_supplier}")
 
-    print(f"✅ Обновлено строк в таблице cards: {updated}")
+            if subject_name and kgvp_supplier is not None:
+                cursor = store.execute("""
+                    UPDATE cards
+                    SET commission_percent = ?
+                    WHERE subjectName = ?
+                """, (kgvp_supplier, subject_name))
+                counters.add(written=cursor.rowcount)
+            else:
+                counters.add(skipped=1)
 
-import sqlite3
+        store.commit()
+        store.close()
 
-def find_incomplete_cards(db_path="wildberries_cards.db"):
+def find_incomplete_cards(db_url: str | None = None):
     # Критически важные поля для расчёта прибыли
     required_fields = [
         "purchase_price", "delivery_to_warehouse", "wb_commission_rub",
@@ -217,10 +116,10 @@ def find_incomplete_cards(db_path="wildberries_cards.db"):
         "defect_percent", "commission_percent"
     ]
 
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    store = open_store(db_url)
 
-    conditions = [f"({field} IS NULL OR {field} = '')" for field in required_fields]
+    # CAST — чтобы сравнение с '' работало и для числовых колонок Postgres
+    conditions = [f"COALESCE(CAST({field} AS TEXT), '') = ''" for field in required_fields]
     where_clause = " OR ".join(conditions)
 
     query = f"""
@@ -229,19 +128,16 @@ def find_incomplete_cards(db_path="wildberries_cards.db"):
         WHERE {where_clause}
     """
 
-    cursor.execute(query)
-    rows = cursor.fetchall()
-    conn.close()
+    rows = store.query(query)
+    store.close()
 
     if not rows:
         print("✅ Все карточки заполнены корректно.")
         return
 
-    ks = 0
     incomplete_rows = []
-    print("🚫 Найдены карточки с неполными данными:\n")
+    print(f"🚫 Найдены карточки с неполными данными: {len(rows)}")
     for row in rows:
-        ks += 1
         vendor_code = row[0]
         incomplete_rows.append(row)
         nm_id = row[1]
@@ -249,9 +145,8 @@ def find_incomplete_cards(db_path="wildberries_cards.db"):
         missing_fields = [
             required_fields[i - 3] for i in range(3, len(row)) if row[i] in (None, '', 0)
         ]
-        print(f"📦 {vendor_code} ({nm_id}) — {imt_name}")
-        print(f"    ❗ Пропущены поля: {', '.join(missing_fields)}\n")
-        print("Кол-во незаполненых до конца карточек", ks)
+        # Подробности по каждой карточке — только на уровне DEBUG
+        log.debug(f"📦 {vendor_code} ({nm_id}) — {imt_name}: пропущены поля {', '.join(missing_fields)}")
 
     if incomplete_rows:
         vendor_codes = [row[0] for row in incomplete_rows if row[0]]
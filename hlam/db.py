@@ -1,44 +1,13 @@
-import sqlite3
+from backend.card_store import upsert_cards
+from backend.storage import open_store
 
-def init_db():
-    conn = sqlite3.connect("../backend/wildberries_cards.db")
-    cursor = conn.cursor()
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS cards (
-        nmID INTEGER PRIMARY KEY,
-        imtID INTEGER,
-        vendorCode TEXT,
-        brand TEXT,
-        subjectName TEXT,
-        vendorID INTEGER,
-        price INTEGER,
-        salePrice INTEGER
-    )
-    """)
-    conn.commit()
-    conn.close()
 
+def init_db():
+    # Миграции применяются при открытии хранилища (DB_URL, по умолчанию — Postgres)
+    open_store().close()
 
 
 def save_cards_to_db(cards):
-    conn = sqlite3.connect("../backend/wildberries_cards.db")
-    cursor = conn.cursor()
-
-    for card in cards:
-        cursor.execute('''
-            INSERT OR REPLACE INTO cards (
-                nmID, imtID, vendorCode, brand, subjectName, price
-            ) VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
-            card["nmID"],
-            card["imtID"],
-            card["vendorCode"],
-            card.get("brand"),
-            card.get("subjectName"),
-            card["price"]
-        ))
-
-    conn.commit()
-    conn.close()
-
-
+    # Upsert, а не INSERT OR REPLACE: цены и себестоимость в cards сохраняются
+    with open_store() as store:
+        upsert_cards(store, cards)
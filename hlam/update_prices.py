@@ -1,79 +1,112 @@
-import os
-import httpx
-import sqlite3
 import asyncio
-import time
-from dotenv import load_dotenv
+from datetime import datetime
 
-# 📌 Загружаем API-ключ из файла .env
-load_dotenv("../backend/api.env")
-WB_API_KEY = os.getenv("WB_API_KEY")
+from backend.logs import get_logger, stage
+from backend.storage import open_store
+from backend.wb_api import fetch_price_page
+from backend.wb_client import run
 
 # 🔧 Максимальное количество товаров за один запрос
 LIMIT = 1000
 
+log = get_logger("update_prices")
+
+
+# 💱 Цена к одному виду (рубли с копейками), чтобы 2040 из базы и 2040.0 от WB совпадали
+def normalize_price(value):
+    return None if value is None else round(float(value), 2)
+
+
+# 🧾 Цены из ответа WB: (nmID, price, discountedPrice) по первому размеру
+def parse_prices(goods: list) -> list:
+    rows = []
+    for item in goods:
+        sizes = item.get("sizes", [])
+        if sizes:
+            rows.append((
+                item.get("nmID"),
+                normalize_price(sizes[0].get("price")),
+                normalize_price(sizes[0].get("discountedPrice")),
+            ))
+        else:
+            rows.append((item.get("nmID"), None, None))
+    return rows
+
+
+# 💾 Запись одной страницы: UPDATE и журнал только для изменившихся цен
+def apply_price_page(store, current: dict, goods: list) -> int:
+    changed_at = datetime.utcnow().isoformat(timespec="seconds")
+    updates = []
+    journal = []
+    for nm_id, price, sale_price in parse_prices(goods):
+        if nm_id not in current:
+            continue  # карточки нет в каталоге
+        old_price, old_sale_price = current[nm_id]
+        if (old_price, old_sale_price) == (price, sale_price):
+            continue
+        updates.append((price, sale_price, nm_id))
+        journal.append((nm_id, changed_at, old_price, price, old_sale_price, sale_price))
+        current[nm_id] = (price, sale_price)
+
+    if updates:
+        store.executemany("UPDATE cards SET price = ?, salePrice = ? WHERE nmID = ?", updates)
+        store.executemany(
+            "INSERT INTO price_changes"
+            " (nmID, changed_at, old_price, new_price, old_salePrice, new_salePrice)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            journal,
+        )
+    store.commit()
+    return len(updates)
+
+
 # 🔄 Основная асинхронная функция обновления цен
 async def update_prices_get_method():
     # Подключение к базе данных
-    conn = sqlite3.connect("../backend/wildberries_cards.db")
-    cursor = conn.cursor()
+    store = open_store()
+    # Текущие цены каталога — чтобы писать только изменения
+    current = {
+        row[0]: (normalize_price(row[1]), normalize_price(row[2]))
+        for row in store.query("SELECT nmID, price, salePrice FROM cards")
+    }
 
     offset = 0
-    base_url = "https://discounts-prices-api.wildberries.ru/api/v2/list/goods/filter"
-    headers = {"Authorization": WB_API_KEY}
+    changed = 0
+    complete = False
+    next_page = asyncio.create_task(fetch_price_page(offset, LIMIT))
 
-    async with httpx.AsyncClient(timeout=10) as client:
+    with stage(log, "price_sync") as counters:
         while True:
-            params = {"limit": LIMIT, "offset": offset}
             try:
-                print(f"🔄 Получаем товары с offset={offset}...")
-
-                response = await client.get(base_url, headers=headers, params=params)
-                response.raise_for_status()
-                data = response.json()
-
+                log.debug(f"🔄 Получаем товары с offset={offset}...")
 
-                goods = data.get("data", {}).get("listGoods", [])
+                goods = await next_page
 
                 if not goods:
-                    print("✅ Все товары обработаны.")
+                    log.info("✅ Все товары обработаны.")
+                    complete = True
                     break
 
-                # Обновление каждой карточки в базе
-                for item in goods:
-
-                    nm_id = item.get("nmID")
-
-                    sizes = item.get("sizes", [])
-                    if sizes:
-                        price = sizes[0].get("price")
-                        sale_price = sizes[0].get("discountedPrice")
-                    else:
-                        price = None
-                        sale_price = None
-
-
-                    cursor.execute("""
-                        UPDATE cards
-                        SET price = ?, salePrice = ?
-                        WHERE nmID = ?
-                    """, (price, sale_price, nm_id))
-
-                conn.commit()
+                # Следующая страница качается, пока текущая пишется в базу
                 offset += LIMIT
-                time.sleep(0.6)  # ограничение частоты запросов
+                next_page = asyncio.create_task(fetch_price_page(offset, LIMIT))
+                page_changed = await asyncio.to_thread(apply_price_page, store, current, goods)
+                changed += page_changed
+                counters.add(pages=1, goods=len(goods), changed=page_changed)
 
             except Exception as e:
-                print(f"❌ Ошибка при запросе: {e}")
+                # Повторы уже исчерпаны в клиенте — дальше страницы не качаем
+                log.error(f"❌ Ошибка при запросе (offset={offset}): {e}")
+                counters.add(failed=1)
                 break
 
-    conn.close()
-    print("🎯 Обновление завершено.")
+    if not next_page.done():
+        next_page.cancel()
+    store.close()
+    if not complete:
+        log.warning(f"⚠️ Обновление прервано: цены после offset={offset} не обновлены")
+    log.info(f"🎯 Обновление завершено. Изменилось цен: {changed}")
 
 # 🔽 Запуск функции при старте скрипта
 if __name__ == "__main__":
-    asyncio.run(update_prices_get_method())
-
-
-
-
+    run(update_prices_get_method())
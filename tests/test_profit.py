@@ -0,0 +1,54 @@
+import pytest
+
+from backend.storage import enrich_sales_rows, load_card_details, normalize_sales, open_store, upsert_sales
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = open_store(f"sqlite:///{tmp_path / 'test.db'}")
+    yield store
+    store.close()
+
+
+def ingest(store, entries: list, cards_info: dict, ad_by_day: dict | None = None):
+    rows = normalize_sales(entries, cards_info)
+    rows = enrich_sales_rows(rows, ad_by_day or {}, load_card_details(store))
+    upsert_sales(store, rows)
+
+
+def history(day: str, orders: int) -> dict:
+    return {"dt": day, "ordersCount": orders, "openCardCount": 100}
+
+
+def test_stored_profit_matches_rollups(store):
+    store.bulk_upsert("cards", [
+        # Закэшированные себестоимость и прибыль устарели: цена и закупка поменялись после пересчёта
+        {"nmID": 1, "imtID": 10, "vendorCode": "a", "salePrice": 2500, "purchase_price": 900,
+         "tax_rub": 300, "wb_commission_rub": 500, "defect_percent": 5,
+         "cost_price": 1000, "profit_per_item": 1000},
+        # Карточка без пересчёта: ни прибыли, ни процента брака
+        {"nmID": 2, "imtID": 10, "vendorCode": "b", "salePrice": 1200.5, "purchase_price": 400,
+         "packaging": 15},
+        # Карточка без цены
+        {"nmID": 3, "imtID": 20, "vendorCode": "c", "purchase_price": 100},
+    ], ("nmID",))
+    cards_info = {1: {"imtID": 10}, 2: {"imtID": 10}, 3: {"imtID": 20}}
+    entries = [
+        {"nmID": nm_id, "vendorCode": vendor, "history": [history("2025-01-01", 3), history("2025-01-02", 7)]}
+        for nm_id, vendor in ((1, "a"), (2, "b"), (3, "c"))
+    ]
+    ad_by_day = {"2025-01-02": {1: {"ad_spend": 120.5}, 3: {"ad_spend": 40}}}
+    ingest(store, entries, cards_info, ad_by_day)
+
+    stored = store.query("SELECT SUM(total_profit) FROM sales")[0][0]
+    assert store.query("SELECT SUM(profit) FROM sales_daily_imt")[0][0] == pytest.approx(stored)
+    assert store.query("SELECT SUM(profit) FROM sales_daily_vendor")[0][0] == pytest.approx(stored)
+
+    # Строка sales согласована сама с собой, а не с закэшированными полями карточки
+    cost, unit, profit, orders, ad_spend = store.query(
+        "SELECT cost_price, profit_per_item, total_profit, ordersCount, ad_spend"
+        " FROM sales WHERE nm_ID = 1 AND date = '2025-01-02'"
+    )[0]
+    assert cost == pytest.approx((900 + 300 + 500 + 100) * 1.05)
+    assert unit == pytest.approx(2500 - cost)
+    assert profit == pytest.approx(unit * orders - ad_spend)
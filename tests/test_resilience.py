@@ -0,0 +1,154 @@
+import asyncio
+
+import httpx
+import pytest
+
+from backend.rate_limit import ENDPOINT_QUOTAS, HOST_QUOTAS, RateLimiter, scale_quotas
+from backend.resilience import CircuitBreaker, CircuitOpenError, RetryPolicy
+from backend.wb_client import WBClient
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker(threshold=3, reset_timeout=60, clock=clock)
+
+
+def trip(breaker):
+    for _ in range(breaker.threshold):
+        breaker.check("host")
+        breaker.failure()
+
+
+# === Автомат ===
+def test_opens_after_threshold_failures(breaker):
+    for _ in range(breaker.threshold - 1):
+        assert breaker.check("host") is False
+        assert breaker.failure() is False
+    assert breaker.state == "closed"
+    assert breaker.failure() is True
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.check("host")
+
+
+def test_success_resets_failure_count(breaker):
+    breaker.failure()
+    breaker.failure()
+    breaker.success()
+    breaker.failure()
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_one_trial_through(breaker, clock):
+    trip(breaker)
+    clock.now += 60
+    assert breaker.state == "half-open"
+    assert breaker.check("host") is True
+    with pytest.raises(CircuitOpenError):
+        breaker.check("host")
+
+
+def test_trial_success_closes(breaker, clock):
+    trip(breaker)
+    clock.now += 60
+    breaker.check("host")
+    breaker.success()
+    assert breaker.state == "closed"
+    assert breaker.check("host") is False
+
+
+def test_trial_failure_reopens(breaker, clock):
+    trip(breaker)
+    clock.now += 60
+    breaker.check("host")
+    assert breaker.failure() is True
+    assert breaker.state == "open"
+    clock.now += 59
+    with pytest.raises(CircuitOpenError):
+        breaker.check("host")
+
+
+def test_released_trial_can_be_retried(breaker, clock):
+    trip(breaker)
+    clock.now += 60
+    breaker.check("host")
+    breaker.release()
+    assert breaker.check("host") is True
+
+
+# === Автомат внутри WBClient ===
+def make_client(statuses: list) -> WBClient:
+    """Клиент, которому MockTransport отвечает статусами по очереди (последний — дальше всегда)."""
+    queue = list(statuses)
+
+    def handler(request):
+        status = queue.pop(0) if len(queue) > 1 else queue[0]
+        return httpx.Response(status, json={})
+
+    # Квоты без ожидания: тест проверяет автомат, а не лимитер
+    limiter = RateLimiter(scale_quotas(ENDPOINT_QUOTAS, 1000), scale_quotas(HOST_QUOTAS, 1000))
+    client = WBClient(
+        token="test", limiter=limiter, policy=RetryPolicy(retries=0, base_delay=0),
+        transport=httpx.MockTransport(handler), base_url="http://wb.test", http2=False,
+    )
+    client.archive = None
+    client.breakers["content"] = CircuitBreaker(threshold=5, reset_timeout=60, clock=FakeClock())
+    return client
+
+
+async def call(client: WBClient) -> int:
+    response = await client.get("content", "/ping")
+    return response.status_code
+
+
+@pytest.mark.parametrize("trial_status", [404, 429])
+def test_non_5xx_trial_closes_breaker(trial_status):
+    async def scenario():
+        client = make_client([503] * 5 + [trial_status, 200])
+        breaker = client.breakers["content"]
+        for _ in range(5):
+            await call(client)
+        assert breaker.state == "open"
+        breaker._clock.now += 60
+        assert await call(client) == trial_status
+        assert breaker.state == "closed"
+        assert await call(client) == 200
+        await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_trial_is_released():
+    async def scenario():
+        client = make_client([503] * 5 + [200])
+        breaker = client.breakers["content"]
+        for _ in range(5):
+            await call(client)
+        breaker._clock.now += 60
+
+        async def blocked(*args, **kwargs):
+            raise asyncio.CancelledError
+
+        client.limiter.acquire = blocked
+        with pytest.raises(asyncio.CancelledError):
+            await call(client)
+        assert breaker.trial is False
+        del client.limiter.acquire
+        assert await call(client) == 200
+        assert breaker.state == "closed"
+        await client.aclose()
+
+    asyncio.run(scenario())